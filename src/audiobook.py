@@ -1,11 +1,13 @@
 """Audiobook generation using Chatterbox TTS via Replicate."""
 
 import re
+import shutil
+import subprocess
 import time
+import wave
+from concurrent.futures import Future, as_completed
 from pathlib import Path
 from typing import Optional
-import requests
-import replicate
 
 from src.config import (
     FULL_TEXT_DIR,
@@ -15,7 +17,12 @@ from src.config import (
     TTS_EXAGGERATION,
     TTS_CFG_WEIGHT,
     TTS_TEMPERATURE,
+    MAX_PARALLEL_TTS,
 )
+from src import telemetry
+from src.checkpoint import get_journal, is_built, mark_built
+from src.manifest import fingerprint
+from src.replicate_client import PredictionManager, run_model, download_output, upload_file
 from src.tasks import create_tts_formatting_task
 from crewai import Crew, Process
 
@@ -23,6 +30,15 @@ from crewai import Crew, Process
 # Maximum text length per Chatterbox request (conservative estimate)
 MAX_CHUNK_LENGTH = 2000
 
+# Silence inserted between concatenated chunks
+CHUNK_GAP_MS = 500
+
+# Frames read from a chunk per write to the encoder
+CONCAT_BLOCK_FRAMES = 65536
+
+# ffmpeg raw PCM formats by sample width in bytes
+PCM_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
 
 def format_for_tts(markdown_content: str) -> str:
     """
@@ -194,6 +210,48 @@ def generate_audio_chunk(
     Returns:
         URL to generated audio file
     """
+    input_params = build_tts_input(text, audio_prompt, exaggeration, cfg_weight, temperature)
+    output = run_model(CHATTERBOX_MODEL, input=input_params)
+
+    return output
+
+
+def submit_audio_chunk(
+    predictions: PredictionManager,
+    text: str,
+    output_path: Path,
+    audio_prompt: Optional[str] = None,
+    exaggeration: float = TTS_EXAGGERATION,
+    cfg_weight: float = TTS_CFG_WEIGHT,
+    temperature: float = TTS_TEMPERATURE,
+) -> Future:
+    """
+    Queue audio for a single text chunk without holding a thread.
+
+    Args:
+        predictions: Prediction manager the Chatterbox prediction runs on
+        text: Text to synthesize
+        output_path: Where the audio is downloaded once it is ready
+        audio_prompt: Optional reference audio URL for voice cloning
+        exaggeration: Emotion control (0.5 = neutral)
+        cfg_weight: Pace control
+        temperature: Randomness
+
+    Returns:
+        Future resolving to output_path
+    """
+    input_params = build_tts_input(text, audio_prompt, exaggeration, cfg_weight, temperature)
+    return predictions.submit(CHATTERBOX_MODEL, input=input_params, output_path=output_path)
+
+
+def build_tts_input(
+    text: str,
+    audio_prompt: Optional[str],
+    exaggeration: float,
+    cfg_weight: float,
+    temperature: float,
+) -> dict:
+    """Chatterbox input parameters for one chunk."""
     input_params = {
         "prompt": text,
         "exaggeration": exaggeration,
@@ -205,58 +263,132 @@ def generate_audio_chunk(
     if audio_prompt:
         input_params["audio_prompt"] = audio_prompt
 
-    output = replicate.run(CHATTERBOX_MODEL, input=input_params)
-
-    return output
+    return input_params
 
 
 def download_audio(url: str, output_path: Path) -> Path:
-    """Download audio file from URL."""
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-
-    with open(output_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
-
-    return output_path
+    """Download audio file from URL (retried on transient failures)."""
+    return download_output(url, output_path)
 
 
-def concatenate_audio_files(audio_files: list[Path], output_path: Path) -> Path:
+def iter_pcm_blocks(audio_file: Path, channels: int, sample_width: int, frame_rate: int):
     """
-    Concatenate multiple audio files into one.
+    Yield a chunk's audio as raw PCM blocks in the given format.
 
-    Uses pydub for audio manipulation.
+    WAV files already in that format are read a block at a time with the
+    wave module. Anything else (other sample rates, compressed formats) is
+    converted with pydub, which holds just that one chunk in memory.
     """
+    try:
+        with wave.open(str(audio_file), "rb") as wav:
+            if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (
+                    channels, sample_width, frame_rate):
+                while True:
+                    block = wav.readframes(CONCAT_BLOCK_FRAMES)
+                    if not block:
+                        return
+                    yield block
+    except wave.Error:
+        pass  # Not PCM WAV; decode below
+
     from pydub import AudioSegment
 
-    combined = AudioSegment.empty()
+    segment = (AudioSegment.from_file(audio_file)
+               .set_channels(channels)
+               .set_sample_width(sample_width)
+               .set_frame_rate(frame_rate))
+    yield segment.raw_data
+
+
+def read_audio_format(audio_file: Path) -> tuple[int, int, int]:
+    """(channels, sample width in bytes, frame rate) of an audio file."""
+    try:
+        with wave.open(str(audio_file), "rb") as wav:
+            return wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+    except wave.Error:
+        from pydub import AudioSegment
 
-    for audio_file in audio_files:
         segment = AudioSegment.from_file(audio_file)
-        # Add a small pause between segments
-        combined += segment + AudioSegment.silent(duration=500)
+        return segment.channels, segment.sample_width, segment.frame_rate
+
+
+def concatenate_audio_files(audio_files: list[Path], output_path: Path) -> Path:
+    """
+    Concatenate multiple audio files into one MP3.
+
+    Chunks are streamed, a block of PCM frames at a time, into an ffmpeg
+    encoder subprocess, with CHUNK_GAP_MS of silence written between them.
+    Peak memory is a few blocks (one chunk when a chunk needs converting),
+    however long the book is. The output uses the first chunk's channels,
+    sample width and rate; other chunks are converted to match.
+    """
+    if not audio_files:
+        raise RuntimeError("No audio chunks were generated successfully")
+
+    channels, sample_width, frame_rate = read_audio_format(audio_files[0])
+    gap = b"\x00" * (frame_rate * CHUNK_GAP_MS // 1000) * channels * sample_width
+    if sample_width == 1:
+        gap = b"\x80" * len(gap)  # Unsigned 8-bit silence is mid-scale
+
+    encoder = subprocess.Popen(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", PCM_FORMATS[sample_width], "-ar", str(frame_rate), "-ac", str(channels),
+            "-i", "pipe:0",
+            "-codec:a", "libmp3lame", "-b:a", "192k",
+            str(output_path),
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
 
-    # Export as MP3
-    combined.export(output_path, format="mp3", bitrate="192k")
+    try:
+        for audio_file in audio_files:
+            for block in iter_pcm_blocks(audio_file, channels, sample_width, frame_rate):
+                encoder.stdin.write(block)
+            # Add a small pause between segments
+            encoder.stdin.write(gap)
+        encoder.stdin.close()
+    except BrokenPipeError:
+        # ffmpeg exited early; its error is reported below
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+    except BaseException:
+        encoder.kill()
+        encoder.wait()
+        raise
+
+    stderr = encoder.stderr.read().decode(errors="replace")
+    if encoder.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {output_path}: {stderr.strip()}")
 
     return output_path
 
 
+@telemetry.phase("tts")
 def generate_audiobook(
     markdown_path: Path = None,
     output_path: Path = None,
     use_agent_formatting: bool = False,
     audio_prompt: Optional[str] = None,
+    max_parallel: int = MAX_PARALLEL_TTS,
 ) -> Path:
     """
     Generate audiobook from markdown document.
 
+    Chunks are synthesized concurrently, each written to its own file by
+    chunk index, and reassembled strictly in index order.
+
     Args:
         markdown_path: Path to markdown file (defaults to full-text output)
         output_path: Path for audio output (defaults to audio directory)
         use_agent_formatting: If True, use CrewAI agent for TTS formatting
-        audio_prompt: Optional reference audio for voice cloning
+        audio_prompt: Optional reference audio for voice cloning: a URL, or a
+                      local file that is uploaded to Replicate once
+        max_parallel: Maximum chunk predictions in flight at once
 
     Returns:
         Path to generated audiobook
@@ -267,8 +399,30 @@ def generate_audiobook(
     if output_path is None:
         output_path = AUDIO_DIR / "mcp-crash-course.mp3"
 
+    # A local voice reference is hashed by content and sent by reference
+    voice_file = Path(audio_prompt) if audio_prompt and Path(audio_prompt).is_file() else None
+
+    inputs = {
+        "markdown": markdown_path,
+        "formatting": "agent" if use_agent_formatting else "simple",
+        "voice_reference": voice_file or audio_prompt,
+        "model": CHATTERBOX_MODEL,
+        "params": {
+            "exaggeration": TTS_EXAGGERATION,
+            "cfg_weight": TTS_CFG_WEIGHT,
+            "temperature": TTS_TEMPERATURE,
+            "max_chunk_length": MAX_CHUNK_LENGTH,
+        },
+    }
+    if is_built("audiobook", inputs, [output_path]):
+        print(f"Audiobook up to date, reusing: {output_path}")
+        return output_path
+
     print(f"Generating audiobook from {markdown_path}...")
 
+    if voice_file is not None:
+        audio_prompt = upload_file(voice_file)
+
     # Read markdown
     markdown_content = markdown_path.read_text()
 
@@ -287,42 +441,65 @@ def generate_audiobook(
     chunks = chunk_text(tts_text)
     print(f"Split into {len(chunks)} chunks for TTS processing")
 
-    # Generate audio for each chunk
-    audio_files = []
+    # Generate audio for each chunk; files are named by index so completion
+    # order never affects the assembled book
     temp_dir = AUDIO_DIR / "temp"
     temp_dir.mkdir(exist_ok=True)
-
-    for i, chunk in enumerate(chunks):
-        print(f"Generating audio for chunk {i + 1}/{len(chunks)}...")
-
-        try:
-            audio_url = generate_audio_chunk(chunk, audio_prompt=audio_prompt)
-
-            # Download audio
-            temp_file = temp_dir / f"chunk_{i:04d}.wav"
-            download_audio(audio_url, temp_file)
-            audio_files.append(temp_file)
-
-            # Rate limiting - be nice to the API
-            if i < len(chunks) - 1:
-                time.sleep(1)
-
-        except Exception as e:
-            print(f"Error generating chunk {i + 1}: {e}")
-            continue
-
-    if not audio_files:
-        raise RuntimeError("No audio chunks were generated successfully")
+    audio_files = [temp_dir / f"chunk_{i:04d}.wav" for i in range(len(chunks))]
+
+    failed_chunks = []
+    journal = get_journal()
+    chunk_params = {key: value for key, value in inputs.items() if key != "markdown"}
+    if voice_file is not None:
+        chunk_params["voice_reference"] = fingerprint(voice_file)
+
+    def chunk_unit(i: int) -> tuple[str, dict]:
+        return f"audio-chunk-{i:04d}", {"text": chunks[i], **chunk_params}
+
+    # Chunks finished before a crash are reused on --resume
+    pending = [i for i in range(len(chunks))
+               if not journal.is_complete(*chunk_unit(i), [audio_files[i]])]
+    if len(pending) < len(chunks):
+        print(f"Reusing {len(chunks) - len(pending)} chunks from the previous run")
+
+    if pending:
+        print(f"Synthesizing {len(pending)} chunks, up to {max_parallel} at a time")
+        start = time.monotonic()
+        with PredictionManager(max_in_flight=max_parallel) as predictions:
+            futures = {
+                submit_audio_chunk(predictions, chunks[i], audio_files[i], audio_prompt=audio_prompt): i
+                for i in pending
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                elapsed = time.monotonic() - start
+                eta = elapsed / done * (len(pending) - done)
+                try:
+                    future.result()
+                except Exception as e:
+                    # Retries are exhausted; keep going so one bad chunk doesn't waste the rest
+                    print(f"Error generating chunk {i + 1}: {e}")
+                    failed_chunks.append(i + 1)
+                    continue
+                journal.complete(*chunk_unit(i), [audio_files[i]])
+                print(f"Chunk {i + 1}/{len(chunks)} done "
+                      f"[{done}/{len(pending)}, {elapsed:.0f}s elapsed, ETA {eta:.0f}s]")
+
+    # Never silently publish an audiobook with gaps
+    if failed_chunks:
+        raise RuntimeError(
+            f"{len(failed_chunks)} of {len(chunks)} audio chunks failed after retries: "
+            f"{sorted(failed_chunks)}. Generated chunks are kept in {temp_dir}"
+        )
 
     # Concatenate all audio files
     print("Concatenating audio files...")
     final_path = concatenate_audio_files(audio_files, output_path)
 
-    # Clean up temp files
-    for f in audio_files:
-        f.unlink()
-    temp_dir.rmdir()
+    # Clean up temp files, including chunks left by earlier failed runs
+    shutil.rmtree(temp_dir)
 
+    mark_built("audiobook", inputs, [final_path, tts_text_path])
     print(f"Audiobook saved to: {final_path}")
     return final_path
 
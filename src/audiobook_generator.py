@@ -7,9 +7,11 @@ Uses Gemini 3 for text preprocessing and Chatterbox via Replicate for TTS with v
 import os
 import re
 import time
-import requests
+from concurrent.futures import Future
 from pathlib import Path
-import replicate
+
+from src import telemetry
+from src.replicate_client import PredictionManager, upload_file
 
 # Configuration
 TTS_MODEL = "resemble-ai/chatterbox"
@@ -97,41 +99,26 @@ def chunk_text(text: str, max_chars: int = 2000) -> list[str]:
 
 
 def upload_voice_reference() -> str:
-    """Convert voice reference to data URL for Replicate."""
-    import base64
-    import mimetypes
-
-    mime_type = mimetypes.guess_type(str(VOICE_REFERENCE))[0] or "audio/mpeg"
-
-    with open(VOICE_REFERENCE, "rb") as f:
-        audio_data = f.read()
-
-    base64_data = base64.b64encode(audio_data).decode("utf-8")
-    return f"data:{mime_type};base64,{base64_data}"
-
-
-def generate_audio_chunk(text: str, voice_url: str, output_path: Path) -> bool:
-    """Generate audio for a text chunk using Chatterbox."""
-    try:
-        output = replicate.run(
-            TTS_MODEL,
-            input={
-                "prompt": text,
-                "audio_prompt": voice_url,
-                **TTS_SETTINGS
-            }
-        )
-
-        if output:
-            response = requests.get(output)
-            if response.status_code == 200:
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                return True
-        return False
-    except Exception as e:
-        print(f"    ⚠ TTS generation failed: {e}")
-        return False
+    """Upload the voice reference to Replicate (cached by content hash) and return its URL."""
+    return upload_file(VOICE_REFERENCE)
+
+
+def submit_audio_chunk(
+    predictions: PredictionManager,
+    text: str,
+    voice_url: str,
+    output_path: Path,
+) -> Future:
+    """Queue audio for a text chunk using Chatterbox; resolves to output_path."""
+    return predictions.submit(
+        TTS_MODEL,
+        input={
+            "prompt": text,
+            "audio_prompt": voice_url,
+            **TTS_SETTINGS
+        },
+        output_path=output_path,
+    )
 
 
 def concatenate_audio_files(audio_files: list[Path], output_path: Path):
@@ -205,57 +192,84 @@ def main():
     print(f"  ✓ Voice ready")
 
     all_chapter_audios = []
-
-    for chapter_name, content in chapters:
-        chapter_audio_path = AUDIO_OUTPUT_DIR / f"{chapter_name}.wav"
-
-        # Skip if already exists
-        if chapter_audio_path.exists():
-            print(f"{chapter_name} already exists, skipping...")
-            all_chapter_audios.append(chapter_audio_path)
-            continue
-
-        print(f"Processing {chapter_name}...")
-        start_time = time.time()
-
-        # Step 1: Clean markdown
-        print("  → Cleaning markdown...")
-        clean_text = clean_markdown_for_tts(content)
-
-        # Step 2: Simple TTS optimization
-        print("  → Optimizing for speech...")
-        optimized_text = simple_tts_optimize(clean_text)
-
-        # Step 3: Chunk text
-        chunks = chunk_text(optimized_text)
-        print(f"  → Split into {len(chunks)} chunks")
-
-        # Step 4: Generate audio for each chunk
-        chunk_audio_files = []
-        for i, chunk in enumerate(chunks):
-            chunk_path = AUDIO_OUTPUT_DIR / f"{chapter_name}_chunk_{i:03d}.wav"
-            print(f"    • Generating chunk {i+1}/{len(chunks)}...")
-
-            success = generate_audio_chunk(chunk, voice_url, chunk_path)
-            if success:
-                chunk_audio_files.append(chunk_path)
-            else:
-                print(f"      ⚠ Failed to generate chunk {i+1}")
-
-            time.sleep(1)  # Rate limiting
-
-        # Step 5: Concatenate chunks
-        if chunk_audio_files:
-            print(f"  → Concatenating {len(chunk_audio_files)} audio files...")
-            concatenate_audio_files(chunk_audio_files, chapter_audio_path)
-            all_chapter_audios.append(chapter_audio_path)
-
-        elapsed = time.time() - start_time
-        print(f"  ✓ Completed {chapter_name} ({elapsed:.1f}s)")
-        print()
+    incomplete_chapters = []
+
+    with PredictionManager() as predictions:
+        # Queue every missing chunk of every chapter up front; predictions run
+        # concurrently while chapters are assembled below in order
+        pending_chapters = []
+        for chapter_name, content in chapters:
+            chapter_audio_path = AUDIO_OUTPUT_DIR / f"{chapter_name}.wav"
+
+            # Skip if already exists
+            if chapter_audio_path.exists():
+                print(f"{chapter_name} already exists, skipping...")
+                pending_chapters.append((chapter_name, chapter_audio_path, None))
+                continue
+
+            print(f"Processing {chapter_name}...")
+
+            # Step 1: Clean markdown
+            clean_text = clean_markdown_for_tts(content)
+
+            # Step 2: Simple TTS optimization
+            optimized_text = simple_tts_optimize(clean_text)
+
+            # Step 3: Chunk text
+            chunks = chunk_text(optimized_text)
+
+            # Step 4: Queue audio for each chunk (chunks left by a failed run are reused)
+            chunk_jobs = []
+            queued = 0
+            for i, chunk in enumerate(chunks):
+                chunk_path = AUDIO_OUTPUT_DIR / f"{chapter_name}_chunk_{i:03d}.wav"
+                future = None
+                if not chunk_path.exists():
+                    with telemetry.phase("tts"):
+                        future = submit_audio_chunk(predictions, chunk, voice_url, chunk_path)
+                    queued += 1
+                chunk_jobs.append((chunk_path, future))
+            print(f"  → Split into {len(chunks)} chunks, {queued} queued for synthesis")
+            pending_chapters.append((chapter_name, chapter_audio_path, chunk_jobs))
+
+        for chapter_name, chapter_audio_path, chunk_jobs in pending_chapters:
+            if chunk_jobs is None:
+                all_chapter_audios.append(chapter_audio_path)
+                continue
+
+            start_time = time.time()
+            chunk_audio_files = []
+            failed_chunks = []
+            for i, (chunk_path, future) in enumerate(chunk_jobs):
+                if future is not None and future.exception() is not None:
+                    # Retries are exhausted by now; never stitch a chapter with missing audio
+                    print(f"    ⚠ {chapter_name}: chunk {i+1} failed: {future.exception()}")
+                    failed_chunks.append(i + 1)
+                else:
+                    chunk_audio_files.append(chunk_path)
+
+            # Step 5: Concatenate chunks (never stitch a chapter with missing audio)
+            if failed_chunks:
+                print(f"  ✗ {chapter_name}: chunks {failed_chunks} failed; "
+                      f"keeping generated chunks, re-run to complete")
+                incomplete_chapters.append(chapter_name)
+                continue
+
+            if chunk_audio_files:
+                print(f"  → {chapter_name}: concatenating {len(chunk_audio_files)} audio files...")
+                concatenate_audio_files(chunk_audio_files, chapter_audio_path)
+                all_chapter_audios.append(chapter_audio_path)
+
+            elapsed = time.time() - start_time
+            print(f"  ✓ Completed {chapter_name} (waited {elapsed:.1f}s)")
+
+    print()
 
     # Final concatenation of all chapters
-    if all_chapter_audios:
+    if incomplete_chapters:
+        print("-" * 50)
+        print(f"Skipping final audiobook: incomplete chapters {incomplete_chapters}")
+    elif all_chapter_audios:
         print("-" * 50)
         print("Creating final audiobook...")
         final_output = AUDIO_OUTPUT_DIR / "mcp-crash-course-audiobook.wav"
@@ -281,6 +295,10 @@ def main():
     print("-" * 50)
     print("Audiobook generation complete!")
 
+    print()
+    telemetry.print_summary()
+    print(f"Run report: {telemetry.write_report()}")
+
 
 if __name__ == "__main__":
     main()
@@ -4,18 +4,27 @@ Chapter Writer for MCP Crash Course
 Uses Gemini 3 Pro Preview for chapter text and Nano Banana for illustrations.
 """
 
+import contextvars
 import json
-import os
 import re
 import time
-import requests
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from google import genai
-import replicate
+from typing import Callable, Optional
+
+from src.config import GEMINI_MODEL
+from src.gemini_client import SharedContext, generate_with_grounding_result
+from src.outline import align_to_heading, assemble_chapter, build_section_request, outline_chapter
+from src.pipeline import generate_guarded, strip_preamble
+from src.replicate_client import PredictionManager
+from src import telemetry
 
 # Configuration
-GEMINI_MODEL = "gemini-3-pro-preview"
 IMAGE_MODEL = "google/nano-banana"
+DRAFT_BY_SECTION = True  # Outline first, then draft sections concurrently
+MAX_PARALLEL_SECTIONS = 6
+MAX_FIGURES_PER_CHAPTER = 3
+MAX_PARALLEL_FIGURES = 4  # Image predictions in flight at once, overlapping chapter text
 
 BASE_DIR = Path(__file__).parent.parent
 CHAPTER_PROMPTS_FILE = BASE_DIR / "outputs" / "chapter-prompts" / "chapter-prompts.json"
@@ -49,8 +58,36 @@ def slugify(title: str) -> str:
     return slug.strip("-")
 
 
-def build_chapter_prompt(chapter: dict, style_guide: str) -> str:
-    """Build the full prompt for generating a chapter."""
+def build_chapter_context(style_guide: str, by_section: bool = False) -> str:
+    """
+    Build the prompt prefix shared by every chapter (style guide + instructions).
+
+    With by_section, the instructions are for drafting one part of an
+    outlined chapter (see src.outline) rather than a whole chapter.
+    """
+    if by_section:
+        instructions = """Write ONE PART of an outlined chapter, to the target length given in the request, that:
+1. Covers exactly the points assigned to it in the request
+2. Explains its concepts clearly
+3. Includes relevant, realistic examples
+4. Maintains the formal tone specified in the style guide
+5. Starts with the section's ### heading exactly as given (the chapter opening has no heading) and uses #### for subsections
+6. Does NOT include meta-commentary about the writing process
+7. Starts directly with the content (no preamble)
+8. Includes an image placeholder only if the request gives one, copied exactly"""
+    else:
+        instructions = """Write a comprehensive chapter (approximately 3000-5000 words) that:
+1. Addresses all core questions thoroughly
+2. Explains all key concepts clearly
+3. Includes relevant, realistic examples
+4. Maintains the formal tone specified in the style guide
+5. Uses proper markdown formatting with ## for the chapter title and ### for sections
+6. Does NOT include meta-commentary about the writing process
+7. Starts directly with the chapter content (no preamble)
+8. Include 2-3 image placeholders where illustrations would enhance understanding, using this exact format:
+   ![Image: <brief description for image generation>](images/chapter-XX-figure-Y.jpg)
+   Where XX is the chapter number (zero-padded) and Y is the figure number (1, 2, 3...)"""
+
     return f"""You are writing a chapter for a technical book about the Model Context Protocol (MCP).
 
 ## Style Guide
@@ -59,7 +96,14 @@ Follow this style guide strictly:
 
 {style_guide}
 
-## Chapter Details
+## Instructions
+
+{instructions}"""
+
+
+def build_chapter_prompt(chapter: dict) -> str:
+    """Build the chapter-specific part of the prompt."""
+    return f"""## Chapter Details
 
 **Chapter {chapter['chapter_number']}: {chapter['title']}**
 
@@ -81,20 +125,6 @@ Follow this style guide strictly:
 ### Potential Controversies to Address
 {chr(10).join(f"- {p}" for p in chapter['potential_controversies'])}
 
-## Instructions
-
-Write a comprehensive chapter (approximately 3000-5000 words) that:
-1. Addresses all core questions thoroughly
-2. Explains all key concepts clearly
-3. Includes relevant, realistic examples
-4. Maintains the formal tone specified in the style guide
-5. Uses proper markdown formatting with ## for the chapter title and ### for sections
-6. Does NOT include meta-commentary about the writing process
-7. Starts directly with the chapter content (no preamble)
-8. Include 2-3 image placeholders where illustrations would enhance understanding, using this exact format:
-   ![Image: <brief description for image generation>](images/chapter-XX-figure-Y.jpg)
-   Where XX is the chapter number (zero-padded) and Y is the figure number (1, 2, 3...)
-
 Write the chapter now:"""
 
 
@@ -122,49 +152,110 @@ def extract_image_placeholders(content: str) -> list[dict]:
     return [{"description": desc, "filename": fname} for desc, fname in matches]
 
 
-def generate_image(description: str, chapter_title: str, output_path: Path) -> bool:
-    """Generate an image using Nano Banana via Replicate."""
-    try:
-        prompt = build_image_prompt(description, chapter_title)
-
-        output = replicate.run(
-            IMAGE_MODEL,
-            input={
-                "prompt": prompt,
-                "aspect_ratio": "16:9",
-                "output_format": "jpg"
-            }
-        )
-
-        # Download the image
-        if output:
-            response = requests.get(output)
-            if response.status_code == 200:
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                return True
-        return False
-    except Exception as e:
-        print(f"    ⚠ Image generation failed: {e}")
-        return False
-
-
-def generate_chapter(client: genai.Client, chapter: dict, style_guide: str) -> str:
-    """Generate a single chapter using Gemini."""
-    prompt = build_chapter_prompt(chapter, style_guide)
-
-    response = client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=prompt,
+def submit_image(
+    predictions: PredictionManager,
+    description: str,
+    chapter_title: str,
+    output_path: Path,
+) -> Future:
+    """
+    Queue an image using Nano Banana via Replicate.
+
+    Returns:
+        Future resolving to output_path once the image is downloaded
+    """
+    prompt = build_image_prompt(description, chapter_title)
+    return predictions.submit(
+        IMAGE_MODEL,
+        input={
+            "prompt": prompt,
+            "aspect_ratio": "16:9",
+            "output_format": "jpg"
+        },
+        output_path=output_path,
     )
 
-    return response.text
 
+def report_figure(filename: str, future: Future):
+    """Print a figure's outcome once its prediction and download finish."""
+    if future.exception() is None:
+        print(f"    ✓ Generated {filename}")
+    else:
+        # Retries are exhausted by now; a missing figure should not stop the book
+        print(f"    ⚠ Image generation failed for {filename}: {future.exception()}")
 
-def main():
-    # Initialize clients
-    gemini_client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
 
+def generate_chapter(chapter: dict, context: SharedContext) -> str:
+    """Generate a single chapter using Gemini."""
+    return generate_text(build_chapter_prompt(chapter), context)
+
+
+def generate_text(request: str, context: SharedContext) -> str:
+    """
+    Send one request after the shared chapter context.
+
+    Goes through src.gemini_client (response cache, retries, MAX_TOKENS
+    continuation, telemetry), with forbidden openers retried and any
+    remaining preamble stripped as in the pipeline.
+    """
+    result = generate_guarded(lambda extra: generate_with_grounding_result(
+        request + extra, use_search=False, shared_context=context,
+    ))
+    return strip_preamble(result.text)
+
+
+def generate_chapter_by_section(
+    chapter: dict,
+    context: SharedContext,
+    executor: ThreadPoolExecutor,
+    on_figure: Optional[Callable[[dict], None]] = None,
+) -> str:
+    """
+    Generate a chapter outline-first: a fast outline call, then concurrent sections.
+
+    Figures come from the outline (at most MAX_FIGURES_PER_CHAPTER), each
+    assigned to its section as a placeholder in the usual format.
+
+    Args:
+        chapter: Chapter prompt dict
+        context: Shared context built with build_chapter_context(by_section=True)
+        executor: Pool the section requests run on
+        on_figure: Called with {"description", "filename"} for each figure as
+                   soon as the outline assigns it, before any section is drafted
+
+    Returns:
+        Merged chapter markdown under "## {title}"
+    """
+    outline = outline_chapter(chapter)
+
+    placeholders = {}
+    for index, section in enumerate(outline.sections):
+        if section.figure and len(placeholders) < MAX_FIGURES_PER_CHAPTER:
+            figure_num = len(placeholders) + 1
+            filename = f"chapter-{chapter['chapter_number']:02d}-figure-{figure_num}.jpg"
+            placeholders[index] = f"![Image: {section.figure}](images/{filename})"
+            if on_figure is not None:
+                on_figure({"description": section.figure, "filename": filename})
+
+    def draft(index):
+        request = build_section_request(chapter, outline, index, placeholders.get(index))
+        text = generate_text(request, context)
+        heading = None if index is None else f"### {outline.sections[index].heading}"
+        return align_to_heading(text, heading)
+
+    indices = [None, *range(len(outline.sections))]
+    futures = [executor.submit(contextvars.copy_context().run, draft, i) for i in indices]
+    try:
+        opening, *sections = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return assemble_chapter(chapter["title"], opening, sections)
+
+
+def main():
     # Load inputs
     style_guide = load_style_guide()
     chapters = load_chapter_prompts()
@@ -174,50 +265,75 @@ def main():
     print(f"Image model: {IMAGE_MODEL}")
     print("-" * 50)
 
-    for chapter in chapters:
-        chapter_num = chapter["chapter_number"]
-        title = chapter["title"]
-        filename = f"chapter-{chapter_num:02d}-{slugify(title)}.md"
-        output_path = CHAPTERS_OUTPUT_DIR / filename
-
-        # Skip if already exists
-        if output_path.exists():
-            print(f"Chapter {chapter_num} already exists, skipping...")
-            continue
-
-        print(f"Generating Chapter {chapter_num}: {title}...")
-        start_time = time.time()
-
-        try:
-            # Generate chapter text
-            content = generate_chapter(gemini_client, chapter, style_guide)
-
-            # Extract and generate images
-            image_placeholders = extract_image_placeholders(content)
-            if image_placeholders:
-                print(f"  → Generating {len(image_placeholders)} illustrations...")
-                for img in image_placeholders:
-                    img_path = IMAGES_OUTPUT_DIR / img["filename"]
-                    if not img_path.exists():
-                        print(f"    • {img['filename']}: {img['description'][:50]}...")
-                        success = generate_image(img["description"], title, img_path)
-                        if success:
-                            print(f"      ✓ Generated")
-                        time.sleep(1)  # Rate limiting
-
-            # Write chapter to file
-            with open(output_path, "w") as f:
-                f.write(content)
-
-            elapsed = time.time() - start_time
-            print(f"  ✓ Saved to {filename} ({elapsed:.1f}s)")
-
-            # Small delay to avoid rate limiting
-            time.sleep(2)
-
-        except Exception as e:
-            print(f"  ✗ Error generating chapter {chapter_num}: {e}")
-            continue
+    # Style guide and instructions are uploaded once and referenced by every chapter
+    context = SharedContext(
+        build_chapter_context(style_guide, by_section=DRAFT_BY_SECTION),
+        display_name="chapter-writer",
+    )
+    # Figures are Replicate predictions tracked in the background, so chapter
+    # text never waits for images
+    predictions = PredictionManager(max_in_flight=MAX_PARALLEL_FIGURES)
+    figures: dict[str, Future] = {}
+
+    def submit_figure(image: dict, chapter_title: str):
+        filename = image["filename"]
+        if filename in figures or (IMAGES_OUTPUT_DIR / filename).exists():
+            return
+        print(f"    • {filename}: {image['description'][:50]}...")
+        with telemetry.phase("images"):
+            future = submit_image(
+                predictions, image["description"], chapter_title, IMAGES_OUTPUT_DIR / filename
+            )
+        future.add_done_callback(lambda f: report_figure(filename, f))
+        figures[filename] = future
+
+    with context, predictions, ThreadPoolExecutor(max_workers=MAX_PARALLEL_SECTIONS) as executor:
+        for chapter in chapters:
+            chapter_num = chapter["chapter_number"]
+            title = chapter["title"]
+            filename = f"chapter-{chapter_num:02d}-{slugify(title)}.md"
+            output_path = CHAPTERS_OUTPUT_DIR / filename
+
+            # Skip if already exists
+            if output_path.exists():
+                print(f"Chapter {chapter_num} already exists, skipping...")
+                continue
+
+            print(f"Generating Chapter {chapter_num}: {title}...")
+            start_time = time.time()
+
+            try:
+                # Generate chapter text
+                with telemetry.phase("chapters"):
+                    if DRAFT_BY_SECTION:
+                        content = generate_chapter_by_section(
+                            chapter, context, executor,
+                            on_figure=lambda image: submit_figure(image, title),
+                        )
+                    else:
+                        content = generate_chapter(chapter, context)
+
+                # Queue any figures not already started from the outline
+                for img in extract_image_placeholders(content):
+                    submit_figure(img, title)
+
+                # Write chapter to file
+                with open(output_path, "w") as f:
+                    f.write(content)
+
+                elapsed = time.time() - start_time
+                print(f"  ✓ Saved to {filename} ({elapsed:.1f}s)")
+
+            except Exception as e:
+                print(f"  ✗ Error generating chapter {chapter_num}: {e}")
+                continue
+
+        pending = [future for future in figures.values() if not future.done()]
+        if pending:
+            print(f"Waiting for {len(pending)} illustrations still generating...")
+        failed = sum(1 for future in figures.values() if future.exception() is not None)
+        if failed:
+            print(f"  ⚠ {failed} of {len(figures)} illustrations failed")
 
     print("-" * 50)
     print("Chapter generation complete!")
@@ -227,6 +343,10 @@ def main():
     images_created = len(list(IMAGES_OUTPUT_DIR.glob("*.jpg")))
     print(f"Created {chapters_created} chapters and {images_created} images")
 
+    print()
+    telemetry.print_summary()
+    print(f"Run report: {telemetry.write_report()}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,133 @@
+"""Crash-safe checkpoint journal for resuming interrupted runs."""
+
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from src.config import CHECKPOINT_FILE
+from src.manifest import fingerprint_inputs, get_manifest
+
+
+class CheckpointJournal:
+    """
+    Append-only record of the units of work completed by the current run.
+
+    Each completed unit (a chapter, an enhanced chapter, an audio chunk) is
+    written as one JSON line and fsynced before the run moves on, so a crash
+    loses at most the unit in flight. A torn last line is ignored on load.
+
+    A normal run starts a fresh journal. A resumed run keeps the previous
+    one and skips every unit it lists whose inputs are unchanged and whose
+    files still exist, even when the build manifest is being ignored
+    (--rebuild).
+    """
+
+    def __init__(self, path: Path = CHECKPOINT_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._units = None
+        self._file = None
+
+    def start(self, resume: bool = False):
+        """
+        Open the journal for this run.
+
+        Args:
+            resume: Keep the previous run's completed units instead of
+                    starting over
+        """
+        with self._lock:
+            self._open(resume)
+
+    def _open(self, resume: bool):
+        if self._file is not None:
+            self._file.close()
+        self._units = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        header = None
+        torn = False
+        if resume and self.path.exists():
+            content = self.path.read_text()
+            torn = bool(content) and not content.endswith("\n")
+            for line in content.splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash mid-line
+                if "unit" in record:
+                    self._units[record["unit"]] = record
+                elif header is None:
+                    header = record
+            print(f"Resuming run started {header['started_at'] if header else 'earlier'}: "
+                  f"{len(self._units)} units already complete")
+
+        self._file = open(self.path, "a" if resume else "w")
+        if torn:
+            self._file.write("\n")  # Start after the partial line, not inside it
+        if header is None:
+            self._append({
+                "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "argv": sys.argv[1:],
+            })
+
+    def _append(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _ensure_open(self):
+        # Entry points that never call start() get a fresh journal
+        if self._file is None:
+            self._open(resume=False)
+
+    def is_complete(self, unit: str, inputs: Optional[dict[str, Any]] = None,
+                    files: list[Path] = ()) -> bool:
+        """Check whether a unit was completed with the same inputs and its files exist."""
+        with self._lock:
+            record = self._units.get(unit) if self._units is not None else None
+        if record is None:
+            return False
+        return (record["inputs"] == fingerprint_inputs(inputs or {})
+                and all(Path(p).exists() for p in files))
+
+    def complete(self, unit: str, inputs: Optional[dict[str, Any]] = None,
+                 files: list[Path] = ()):
+        """Durably record that a unit of work finished."""
+        record = {
+            "unit": unit,
+            "inputs": fingerprint_inputs(inputs or {}),
+            "files": [str(p) for p in files],
+            "completed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._ensure_open()
+            self._append(record)
+            self._units[unit] = record
+
+
+_journal = None
+
+
+def get_journal() -> CheckpointJournal:
+    """Return the process-wide checkpoint journal."""
+    global _journal
+    if _journal is None:
+        _journal = CheckpointJournal()
+    return _journal
+
+
+def is_built(artifact: str, inputs: dict[str, Any], outputs: list[Path]) -> bool:
+    """Check the build manifest, then this run's checkpoint journal, for a reusable artifact."""
+    return (get_manifest().is_fresh(artifact, inputs, outputs)
+            or get_journal().is_complete(artifact, inputs, outputs))
+
+
+def mark_built(artifact: str, inputs: dict[str, Any], outputs: list[Path]):
+    """Record a finished artifact in both the build manifest and the checkpoint journal."""
+    get_manifest().record(artifact, inputs, outputs)
+    get_journal().complete(artifact, inputs, outputs)
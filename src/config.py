@@ -23,6 +23,8 @@ CHAPTERS_DIR = OUTPUTS_DIR / "chapters"
 FULL_TEXT_DIR = OUTPUTS_DIR / "full-text"
 PDF_DIR = OUTPUTS_DIR / "pdf"
 AUDIO_DIR = OUTPUTS_DIR / "audio"
+RESEARCH_DIR = OUTPUTS_DIR / "research"
+CACHE_DIR = OUTPUTS_DIR / ".cache"
 
 # Input files
 CURRICULUM_FILE = INPUTS_DIR / "curriculum-transcript-formatted.md"
@@ -30,12 +32,69 @@ CURRICULUM_FILE = INPUTS_DIR / "curriculum-transcript-formatted.md"
 # Gemini settings
 GEMINI_MODEL = "gemini-3-pro-preview"  # Best quality for deep technical content
 GEMINI_MODEL_RESEARCH = "gemini-3-pro-preview"  # With grounding for research
+GEMINI_MODEL_FAST = "gemini-2.5-flash"  # Short planning calls (chapter outlines)
+
+# Gemini HTTP connection pool (shared across threads and asyncio tasks)
+GEMINI_MAX_CONNECTIONS = 20
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = 10
+GEMINI_KEEPALIVE_EXPIRY = 60.0  # Seconds an idle connection is kept open
+
+# Gemini response cache (content-addressed, on disk)
+RESPONSE_CACHE_ENABLED = os.getenv("GEMINI_RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_FILE = CACHE_DIR / "gemini-responses.sqlite3"
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # LRU eviction above this size
+RESPONSE_CACHE_GROUNDED_TTL = 7 * 24 * 3600  # Seconds; None keeps search results forever
+
+# Incremental builds (input hashes per artifact; unchanged artifacts are skipped)
+MANIFEST_FILE = OUTPUTS_DIR / "manifest.json"
+REBUILD_ALL = os.getenv("REBUILD_ALL", "0") != "0"
+CHECKPOINT_FILE = CACHE_DIR / "checkpoint.jsonl"  # Units completed by the current run (--resume)
+
+# Gemini explicit context caching (shared prompt prefixes)
+CONTEXT_CACHE_TTL = 3600  # Seconds; refreshed while the run is still using it
+CONTEXT_CACHE_MIN_TOKENS = 4096  # Model minimum; shorter prefixes (e.g. today's chapter-writing context) are sent inline
 
 # Chatterbox TTS settings
 CHATTERBOX_MODEL = "resemble-ai/chatterbox"
 TTS_EXAGGERATION = 0.5  # Neutral
 TTS_CFG_WEIGHT = 0.5
 TTS_TEMPERATURE = 0.8
+MAX_PARALLEL_TTS = 16  # Chatterbox chunk predictions in flight at once
+
+# Streaming preamble guard
+PREAMBLE_GUARD_WINDOW = 1200  # Characters (~300 tokens) inspected before aborting
+PREAMBLE_GUARD_RETRIES = 2  # Stricter-prompt retries before accepting and stripping
+
+# Continuation of free-form responses cut off at the output token limit
+MAX_CONTINUATIONS = 3  # Follow-up requests per response before accepting it truncated
+CONTINUATION_TAIL_CHARS = 4000  # Generated text resent so the model can resume
+CONTINUATION_MIN_OVERLAP = 20  # Shortest repeated text trimmed when splicing
+
+# Rate limits (per process; adapted down on 429 responses)
+GEMINI_RPM = 60
+GEMINI_TPM = 1_000_000  # Input tokens per minute, estimated at ~4 chars/token
+REPLICATE_RPM = 300
+RATE_LIMIT_DEFAULT_BACKOFF = 10.0  # Seconds to pause when a 429 has no Retry-After
+
+# Replicate prediction manager (many predictions tracked by one polling loop)
+REPLICATE_MAX_IN_FLIGHT = 64  # Predictions created but not yet finished
+REPLICATE_POLL_INTERVAL = 2.0  # Seconds between status sweeps over in-flight predictions
+REPLICATE_FILES_CACHE = CACHE_DIR / "replicate-files.json"  # Uploaded inputs by content hash
+REPLICATE_FILE_TTL = 23 * 3600  # Seconds an upload is reused (Replicate expires files after 24h)
+
+# Circuit breaker (per provider)
+CIRCUIT_BREAKER_THRESHOLD = 5  # Consecutive failures before the circuit opens
+CIRCUIT_BREAKER_RESET = 60.0  # Seconds before a trial call is let through
+
+# Concurrency settings
+MAX_PARALLEL_CHAPTERS = 4  # Concurrent chapter generations (1 = sequential)
+ENHANCE_BY_SECTION = True  # Expand ### sections concurrently instead of whole chapters
+DRAFT_BY_SECTION = True  # Outline each chapter, then draft its sections concurrently
+MAX_PARALLEL_SECTIONS = 6  # Concurrent section drafts/enhancements
+RESEARCH_BEFORE_WRITING = True  # Research deduplicated topics once; chapters run without search
+MAX_PARALLEL_RESEARCH = 8  # Concurrent topic research calls
+RESEARCH_CACHE_FILE = CACHE_DIR / "research.sqlite3"  # Grounded notes keyed by normalized topic
+RESEARCH_CACHE_TTL = float(os.getenv("RESEARCH_CACHE_TTL_DAYS", "7")) * 24 * 3600  # Seconds before re-grounding
 
 def validate_config():
     """Validate required configuration."""
@@ -55,5 +114,5 @@ def validate_config():
 
     # Ensure output directories exist
     for dir_path in [STYLE_GUIDE_DIR, CHAPTER_PROMPTS_DIR, CHAPTERS_DIR,
-                     FULL_TEXT_DIR, PDF_DIR, AUDIO_DIR]:
+                     FULL_TEXT_DIR, PDF_DIR, AUDIO_DIR, RESEARCH_DIR, CACHE_DIR]:
         dir_path.mkdir(parents=True, exist_ok=True)
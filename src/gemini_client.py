@@ -1,60 +1,617 @@
 """Gemini client with Google Search grounding for live research."""
 
-from typing import Type, TypeVar
+import asyncio
+import itertools
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Type, TypeVar
+import httpx
 from google import genai
 from google.genai import types
-from pydantic import BaseModel
-from src.config import GOOGLE_API_KEY, GEMINI_MODEL
+from pydantic import BaseModel, ValidationError
+from src.config import (
+    GOOGLE_API_KEY,
+    GEMINI_MODEL,
+    GEMINI_MAX_CONNECTIONS,
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+    GEMINI_KEEPALIVE_EXPIRY,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_GROUNDED_TTL,
+    CONTEXT_CACHE_TTL,
+    CONTEXT_CACHE_MIN_TOKENS,
+    MAX_CONTINUATIONS,
+    CONTINUATION_TAIL_CHARS,
+    CONTINUATION_MIN_OVERLAP,
+)
+from src.response_cache import ResponseCache, get_response_cache
+from src.rate_limit import rate_limited, arate_limited, estimate_tokens
+from src.resilience import call_with_retry, acall_with_retry
+from src.telemetry import record_gemini_call
 
 T = TypeVar("T", bound=BaseModel)
 
 
-def get_client():
-    """Get configured Gemini client."""
-    return genai.Client(api_key=GOOGLE_API_KEY)
+class ConnectionStats:
+    """Thread-safe counters for HTTP requests and newly opened connections."""
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
 
-def generate_with_grounding(prompt: str, use_search: bool = True) -> str:
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            }
+
+
+_clients: dict[str, genai.Client] = {}
+_clients_lock = threading.Lock()
+_stats = ConnectionStats()
+
+
+def _trace(event_name: str, info: dict):
+    """httpcore trace hook: a TCP connect only happens when no pooled connection is free."""
+    if event_name == "connection.connect_tcp.complete":
+        _stats.record_new_connection()
+
+
+async def _atrace(event_name: str, info: dict):
+    _trace(event_name, info)
+
+
+def _on_request(request: httpx.Request):
+    _stats.record_request()
+    request.extensions["trace"] = _trace
+
+
+async def _aon_request(request: httpx.Request):
+    _stats.record_request()
+    request.extensions["trace"] = _atrace
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client(api_key: str = None) -> genai.Client:
+    """
+    Get the shared Gemini client for an API key.
+
+    One client is created per process (per key) and reused by every caller,
+    so HTTP connections are kept alive and pooled across threads and
+    asyncio tasks instead of paying a new TLS handshake per request. Both
+    the sync and the async surface use httpx pools with the
+    GEMINI_MAX_CONNECTIONS limits, and both feed get_connection_stats().
+    """
+    api_key = api_key or GOOGLE_API_KEY
+
+    client = _clients.get(api_key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(
+                    client_args={
+                        "limits": _pool_limits(),
+                        "event_hooks": {"request": [_on_request]},
+                    },
+                    # An explicit transport makes the SDK use httpx rather than
+                    # aiohttp (picked whenever aiohttp is importable), so async
+                    # calls share this bounded pool and show up in the stats
+                    async_client_args={
+                        "transport": httpx.AsyncHTTPTransport(limits=_pool_limits()),
+                        "event_hooks": {"request": [_aon_request]},
+                    },
+                ),
+            )
+            _clients[api_key] = client
+        return client
+
+
+def get_connection_stats() -> dict:
+    """Return request and connection reuse counters for the shared clients."""
+    return _stats.snapshot()
+
+
+# Appended to free-form prompts so the model starts directly with content
+OUTPUT_ONLY_INSTRUCTIONS = """
+
+IMPORTANT: Output ONLY the requested content. Do not include any preamble,
+acknowledgment, or meta-commentary like "I will write..." or "Here is...".
+Start directly with the content itself."""
+
+
+class SharedContext:
+    """
+    A long prompt prefix shared by many requests (style guide, book rules...).
+
+    Used as a context manager, the prefix is uploaded once as a Gemini
+    cached-content object and each request only sends its own suffix. The
+    cache TTL is extended while the run keeps using it and the cache is
+    deleted on exit. If the prefix is below the model's caching minimum, or
+    creation fails, requests fall back to sending the prefix inline.
+
+    Cached content cannot be combined with per-request tools, so grounding
+    is configured on the cache itself via use_search.
+
+    With the current inputs only the per-chapter section-enhancement
+    context (instructions plus the full chapter) normally reaches the
+    minimum. The chapter-writing prefixes (style guide plus rules, ~1.3k
+    tokens) are sent inline until the style guide grows past it.
+    """
+
+    def __init__(self, text: str, display_name: str, use_search: bool = False,
+                 ttl_seconds: int = CONTEXT_CACHE_TTL):
+        self.text = text
+        self.display_name = display_name
+        self.use_search = use_search
+        self.ttl_seconds = ttl_seconds
+        self.name: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SharedContext":
+        self.create()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.delete()
+
+    def create(self):
+        """Upload the prefix as cached content (no-op if it is too short)."""
+        estimated_tokens = estimate_tokens(self.text)
+        if estimated_tokens < CONTEXT_CACHE_MIN_TOKENS:
+            print(f"Context cache '{self.display_name}': ~{estimated_tokens} tokens, "
+                  f"below {CONTEXT_CACHE_MIN_TOKENS} minimum; sending inline")
+            return
+
+        try:
+            cache = call_with_retry("gemini", self._upload, estimated_tokens)
+        except Exception as e:
+            print(f"Context cache '{self.display_name}' unavailable ({e}); sending inline")
+            return
+
+        self.name = cache.name
+        self._expires_at = time.time() + self.ttl_seconds
+        print(f"Context cache '{self.display_name}' created: {self.name}")
+
+    def _upload(self, estimated_tokens: int) -> types.CachedContent:
+        with rate_limited("gemini", tokens=estimated_tokens):
+            return get_client().caches.create(
+                model=GEMINI_MODEL,
+                config=types.CreateCachedContentConfig(
+                    display_name=self.display_name,
+                    contents=[self.text],
+                    tools=_search_tools() if self.use_search else None,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+
+    def keep_alive(self):
+        """Extend the cache TTL once less than half of it remains."""
+        with self._lock:
+            if self.name is None or self._expires_at - time.time() > self.ttl_seconds / 2:
+                return
+            try:
+                with rate_limited("gemini"):
+                    get_client().caches.update(
+                        name=self.name,
+                        config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+                    )
+                self._expires_at = time.time() + self.ttl_seconds
+            except Exception as e:
+                print(f"Context cache '{self.display_name}' expired ({e}); sending inline")
+                self.name = None
+
+    def delete(self):
+        """Delete the cached content; the prefix is sent inline afterwards."""
+        with self._lock:
+            if self.name is None:
+                return
+            try:
+                with rate_limited("gemini"):
+                    get_client().caches.delete(name=self.name)
+            except Exception as e:
+                print(f"Warning: could not delete context cache {self.name}: {e}")
+            self.name = None
+
+    def apply(self, contents: str, config: types.GenerateContentConfig):
+        """
+        Attach the shared prefix to a request.
+
+        Returns:
+            (contents, config) referencing the cached content when available,
+            otherwise with the prefix prepended inline
+        """
+        self.keep_alive()
+        name = self.name
+        if name is None or bool(config.tools) != self.use_search:
+            return f"{self.text}\n\n{contents}", config
+        return contents, config.model_copy(update={"cached_content": name, "tools": None})
+
+
+def _search_tools() -> list[types.Tool]:
+    return [types.Tool(google_search=types.GoogleSearch())]
+
+
+def _build_config(
+    temperature: float,
+    use_search: bool = False,
+    response_schema: Type[BaseModel] = None,
+) -> types.GenerateContentConfig:
+    """Build the generation config shared by the sync and async entry points."""
+    # Enable Google Search grounding for live web results
+    tools = _search_tools() if use_search else []
+
+    if response_schema is None:
+        return types.GenerateContentConfig(
+            tools=tools if tools else None,
+            temperature=temperature,
+        )
+
+    return types.GenerateContentConfig(
+        temperature=temperature,
+        response_mime_type="application/json",
+        response_schema=response_schema,
+        tools=tools if tools else None,
+    )
+
+
+def _parse_structured(text: str, response_schema: Type[T]) -> T:
+    """Parse a JSON response into the Pydantic model."""
+    return response_schema.model_validate(json.loads(text))
+
+
+def _cache_key(
+    contents: str,
+    config: types.GenerateContentConfig,
+    shared_context: Optional[SharedContext] = None,
+    model: str = GEMINI_MODEL,
+) -> str:
+    # Key on the logical prompt so cached and inline context hit the same entry
+    if shared_context is not None:
+        contents = f"{shared_context.text}\n\n{contents}"
+    tools = ["google_search"] if config.tools else []
+    schema = config.response_schema.model_json_schema() if config.response_schema else None
+    return ResponseCache.make_key(model, contents, config.temperature, tools, schema)
+
+
+def _cache_lookup(key: str, config: types.GenerateContentConfig,
+                  model: str = GEMINI_MODEL) -> Optional[dict]:
+    # Grounded responses go stale as the web changes; plain generations don't
+    max_age = RESPONSE_CACHE_GROUNDED_TTL if config.tools else None
+    # Entries written before structured payloads were validated may be malformed
+    cached = get_response_cache().get(
+        key, max_age=max_age, accept=lambda payload: _is_cacheable(payload["text"], config)
+    )
+    if cached is None:
+        return None
+    record_gemini_call(model, from_cache=True)
+    return cached
+
+
+def _is_cacheable(text: Optional[str], config: types.GenerateContentConfig) -> bool:
+    """
+    Whether a response may be stored in (or served from) the response cache.
+
+    Structured responses must parse against their schema first; otherwise a
+    truncated or malformed JSON reply would be replayed from disk on every
+    retry and every later run.
+    """
+    if not text:
+        return False
+    if config.response_schema is None:
+        return True
+    try:
+        _parse_structured(text, config.response_schema)
+    except (ValueError, ValidationError):
+        return False
+    return True
+
+
+def _grounding_sources(response: types.GenerateContentResponse) -> list[dict]:
+    """Extract the web sources Google Search grounding attached to a response."""
+    if not response.candidates:
+        return []
+    metadata = response.candidates[0].grounding_metadata
+    if metadata is None or not metadata.grounding_chunks:
+        return []
+    return [
+        {"title": chunk.web.title, "uri": chunk.web.uri}
+        for chunk in metadata.grounding_chunks
+        if chunk.web is not None
+    ]
+
+
+def _search_queries(response: types.GenerateContentResponse) -> list[str]:
+    """Extract the Google Search queries grounding ran for a response."""
+    if not response.candidates:
+        return []
+    metadata = response.candidates[0].grounding_metadata
+    if metadata is None:
+        return []
+    return list(metadata.web_search_queries or [])
+
+
+def _finish_reason(response: types.GenerateContentResponse) -> Optional[str]:
+    if not response.candidates or response.candidates[0].finish_reason is None:
+        return None
+    reason = response.candidates[0].finish_reason
+    return getattr(reason, "name", str(reason))
+
+
+def _usage(usage: Optional[types.GenerateContentResponseUsageMetadata]) -> dict:
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": usage.prompt_token_count or 0,
+        "candidates_tokens": usage.candidates_token_count or 0,
+        "cached_tokens": usage.cached_content_token_count or 0,
+        "total_tokens": usage.total_token_count or 0,
+    }
+
+
+def merge_sources(*source_lists: list[dict]) -> list[dict]:
+    """Combine source lists, keeping the first entry for each URI."""
+    merged = {}
+    for sources in source_lists:
+        for source in sources:
+            merged.setdefault(source["uri"], source)
+    return list(merged.values())
+
+
+@dataclass
+class GenerationResult:
+    """
+    Generated text with the response metadata.
+
+    sources are the web pages Google Search grounding used ({"title",
+    "uri"}), search_queries the queries it ran, usage the token counts and
+    finish_reason the candidate's finish reason (e.g. "STOP",
+    "MAX_TOKENS"). All of it is stored in the response cache, so cache hits
+    carry the same metadata (usage is empty for older entries).
+    """
+
+    text: str
+    sources: list[dict] = field(default_factory=list)
+    search_queries: list[str] = field(default_factory=list)
+    usage: dict = field(default_factory=dict)
+    finish_reason: Optional[str] = None
+    from_cache: bool = False
+
+    @classmethod
+    def from_response(cls, response: types.GenerateContentResponse) -> "GenerationResult":
+        return cls(
+            text=response.text or "",
+            sources=merge_sources(_grounding_sources(response)),
+            search_queries=_search_queries(response),
+            usage=_usage(response.usage_metadata),
+            finish_reason=_finish_reason(response),
+        )
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "GenerationResult":
+        return cls(
+            text=payload["text"],
+            sources=payload.get("sources", []),
+            search_queries=payload.get("search_queries", []),
+            usage=payload.get("usage", {}),
+            finish_reason=payload.get("finish_reason"),
+            from_cache=True,
+        )
+
+    def to_payload(self) -> dict:
+        return {
+            "text": self.text,
+            "sources": self.sources,
+            "search_queries": self.search_queries,
+            "usage": self.usage,
+            "finish_reason": self.finish_reason,
+        }
+
+
+CONTINUATION_INSTRUCTIONS = """
+
+Your response to the request above was cut off by the output length limit.
+It ends with:
+
+<<<END OF RESPONSE SO FAR>>>
+{tail}
+<<<CUT OFF HERE>>>
+
+Continue the response from exactly where it was cut off. Output ONLY the
+continuation: do not repeat any of the text above, do not restart or
+summarize, and keep the same format. If it stops mid-word or mid-sentence,
+begin with the remaining characters."""
+
+
+def _needs_continuation(finish_reason: Optional[str], config: types.GenerateContentConfig) -> bool:
+    # Truncated JSON cannot be resumed under a response schema; those fail
+    # validation and are re-queued instead
+    return finish_reason == "MAX_TOKENS" and config.response_schema is None
+
+
+def _continuation_prompt(contents: str, text: str) -> str:
+    """Original request plus the tail of the truncated response."""
+    return contents + CONTINUATION_INSTRUCTIONS.format(tail=text[-CONTINUATION_TAIL_CHARS:])
+
+
+def _overlap(text: str, continuation: str) -> int:
+    """Length of text's tail that a continuation repeats at its start."""
+    longest = min(len(text), len(continuation), CONTINUATION_TAIL_CHARS)
+    for size in range(longest, CONTINUATION_MIN_OVERLAP - 1, -1):
+        if continuation.startswith(text[-size:]):
+            return size
+    return 0
+
+
+def _splice(result: GenerationResult, more: GenerationResult) -> GenerationResult:
+    """Join a truncated result and its continuation into one result."""
+    usage = {k: result.usage.get(k, 0) + more.usage.get(k, 0)
+             for k in result.usage.keys() | more.usage.keys()}
+    return GenerationResult(
+        text=result.text + more.text[_overlap(result.text, more.text):],
+        sources=merge_sources(result.sources, more.sources),
+        search_queries=result.search_queries
+        + [q for q in more.search_queries if q not in result.search_queries],
+        usage=usage,
+        finish_reason=more.finish_reason,
+    )
+
+
+def _generate_text(
+    contents: str,
+    config: types.GenerateContentConfig,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+    model: str = GEMINI_MODEL,
+) -> str:
+    """Run one generate_content call through the response cache."""
+    return _generate(contents, config, use_cache, refresh_cache, shared_context, model).text
+
+
+def _generate(
+    contents: str,
+    config: types.GenerateContentConfig,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+    model: str = GEMINI_MODEL,
+) -> GenerationResult:
+    """Like _generate_text, returning the text with its response metadata."""
+    use_cache = use_cache and RESPONSE_CACHE_ENABLED
+    key = _cache_key(contents, config, shared_context, model) if use_cache else None
+
+    if use_cache and not refresh_cache:
+        cached = _cache_lookup(key, config, model)
+        if cached is not None:
+            return GenerationResult.from_payload(cached)
+
+    result = _request(contents, config, shared_context, model)
+    for attempt in range(1, MAX_CONTINUATIONS + 1):
+        if not _needs_continuation(result.finish_reason, config):
+            break
+        print(f"    Response cut off at the token limit ({len(result.text)} chars); "
+              f"continuing ({attempt}/{MAX_CONTINUATIONS})")
+        more = _request(_continuation_prompt(contents, result.text), config, shared_context, model)
+        result = _splice(result, more)
+
+    if use_cache and _is_cacheable(result.text, config):
+        get_response_cache().put(key, result.to_payload())
+    return result
+
+
+def _request(
+    contents: str,
+    config: types.GenerateContentConfig,
+    shared_context: Optional[SharedContext],
+    model: str,
+) -> GenerationResult:
+    """Send one generate_content request (no response cache)."""
+    if shared_context is not None:
+        contents, config = shared_context.apply(contents, config)
+
+    def request():
+        with rate_limited("gemini", tokens=estimate_tokens(contents)):
+            return get_client().models.generate_content(
+                model=model,
+                contents=contents,
+                config=config,
+            )
+
+    start = time.monotonic()
+    response = call_with_retry("gemini", request)
+    record_gemini_call(model, response.usage_metadata, time.monotonic() - start)
+    return GenerationResult.from_response(response)
+
+
+def get_cache_stats() -> dict:
+    """Return response cache hit/miss counters and store size."""
+    return get_response_cache().stats()
+
+
+def generate_with_grounding(
+    prompt: str,
+    use_search: bool = True,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> str:
     """
     Generate content using Gemini with optional Google Search grounding.
 
     Args:
         prompt: The prompt to send to Gemini
         use_search: Whether to enable Google Search grounding for live info
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
 
     Returns:
         Generated text response
     """
-    client = get_client()
+    return _generate_text(
+        prompt + OUTPUT_ONLY_INSTRUCTIONS,
+        _build_config(temperature=0.7, use_search=use_search),
+        use_cache,
+        refresh_cache,
+        shared_context,
+    )
 
-    # Add instruction to output content directly without preamble
-    enhanced_prompt = f"""{prompt}
 
-IMPORTANT: Output ONLY the requested content. Do not include any preamble,
-acknowledgment, or meta-commentary like "I will write..." or "Here is...".
-Start directly with the content itself."""
+def generate_with_grounding_result(
+    prompt: str,
+    use_search: bool = True,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> GenerationResult:
+    """
+    Like generate_with_grounding, keeping the grounding sources, search
+    queries, token usage and finish reason.
 
-    if use_search:
-        # Enable Google Search grounding for live web results
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=enhanced_prompt,
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(google_search=types.GoogleSearch())],
-                temperature=0.7,
-            )
-        )
-    else:
-        # Standard generation without search
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=enhanced_prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.7,
-            )
-        )
+    Args:
+        prompt: The prompt to send to Gemini
+        use_search: Whether to enable Google Search grounding for live info
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
 
-    return response.text
+    Returns:
+        GenerationResult for the response
+    """
+    return _generate(
+        prompt + OUTPUT_ONLY_INSTRUCTIONS,
+        _build_config(temperature=0.7, use_search=use_search),
+        use_cache,
+        refresh_cache,
+        shared_context,
+    )
 
 
 def generate_structured_output(
@@ -62,6 +619,10 @@ def generate_structured_output(
     response_schema: Type[T],
     use_search: bool = False,
     temperature: float = 0.7,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+    model: str = GEMINI_MODEL,
 ) -> T:
     """
     Generate content with structured output using a Pydantic model.
@@ -71,59 +632,506 @@ def generate_structured_output(
         response_schema: Pydantic model class defining the output structure
         use_search: Whether to enable Google Search grounding
         temperature: Creativity level (0-1)
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
+                        (cached content is tied to GEMINI_MODEL)
+        model: Model to call (e.g. GEMINI_MODEL_FAST for short planning calls)
 
     Returns:
         Parsed Pydantic model instance
     """
-    client = get_client()
+    parsed, _ = generate_structured_result(
+        prompt, response_schema, use_search, temperature,
+        use_cache, refresh_cache, shared_context, model,
+    )
+    return parsed
 
-    tools = []
-    if use_search:
-        tools.append(types.Tool(google_search=types.GoogleSearch()))
 
-    response = client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            temperature=temperature,
-            response_mime_type="application/json",
-            response_schema=response_schema,
-            tools=tools if tools else None,
-        )
+def generate_structured_result(
+    prompt: str,
+    response_schema: Type[T],
+    use_search: bool = False,
+    temperature: float = 0.7,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+    model: str = GEMINI_MODEL,
+) -> tuple[T, GenerationResult]:
+    """
+    Like generate_structured_output, also returning the response metadata.
+
+    Args:
+        prompt: The prompt to send
+        response_schema: Pydantic model class defining the output structure
+        use_search: Whether to enable Google Search grounding
+        temperature: Creativity level (0-1)
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
+        model: Model to call
+
+    Returns:
+        Parsed Pydantic model instance and the GenerationResult it came from
+    """
+    result = _generate(
+        prompt,
+        _build_config(temperature, use_search, response_schema),
+        use_cache,
+        refresh_cache,
+        shared_context,
+        model,
     )
+    return _parse_structured(result.text, response_schema), result
 
-    # Parse the JSON response into the Pydantic model
-    import json
-    data = json.loads(response.text)
-    return response_schema.model_validate(data)
 
+def generate_structured_grounded(
+    prompt: str,
+    response_schema: Type[T],
+    temperature: float = 0.7,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+) -> tuple[T, list[dict]]:
+    """
+    Structured output with Google Search grounding, plus the grounding sources.
 
-def generate_structured(prompt: str, temperature: float = 0.7) -> str:
+    Args:
+        prompt: The prompt to send
+        response_schema: Pydantic model class defining the output structure
+        temperature: Creativity level (0-1)
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+
+    Returns:
+        Parsed Pydantic model instance and the web sources ({"title", "uri"})
+        from the response's grounding metadata
+    """
+    parsed, result = generate_structured_result(
+        prompt, response_schema, True, temperature, use_cache, refresh_cache
+    )
+    return parsed, result.sources
+
+
+def generate_structured(
+    prompt: str,
+    temperature: float = 0.7,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> str:
     """
     Generate content without search grounding (for style guide, stitching, etc.)
 
     Args:
         prompt: The prompt to send
         temperature: Creativity level (0-1)
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
 
     Returns:
         Generated text response
     """
-    client = get_client()
+    return _generate_text(
+        prompt + OUTPUT_ONLY_INSTRUCTIONS,
+        _build_config(temperature),
+        use_cache,
+        refresh_cache,
+        shared_context,
+    )
 
-    # Add instruction to output content directly without preamble
-    enhanced_prompt = f"""{prompt}
 
-IMPORTANT: Output ONLY the requested content. Do not include any preamble,
-acknowledgment, or meta-commentary like "I will write..." or "Here is...".
-Start directly with the content itself."""
+class TextStream:
+    """
+    Iterator over text deltas from a streaming generation.
 
-    response = client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=enhanced_prompt,
-        config=types.GenerateContentConfig(
-            temperature=temperature,
+    candidates_tokens is filled in from the usage metadata as chunks arrive
+    and sources from the grounding metadata; these, and the fields of
+    result(), are final once the stream is exhausted. close() aborts the
+    request.
+    """
+
+    def __init__(self):
+        self.candidates_tokens: Optional[int] = None
+        self.sources: list[dict] = []
+        self.search_queries: list[str] = []
+        self.usage: dict = {}
+        self.finish_reason: Optional[str] = None
+        self.text = ""
+        self.from_cache = False
+        self._chunks: Iterator[str] = iter(())
+
+    def __iter__(self) -> Iterator[str]:
+        return self._chunks
+
+    def result(self) -> GenerationResult:
+        """The streamed response as a GenerationResult (complete once exhausted)."""
+        return GenerationResult(
+            text=self.text,
+            sources=self.sources,
+            search_queries=self.search_queries,
+            usage=self.usage,
+            finish_reason=self.finish_reason,
+            from_cache=self.from_cache,
+        )
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _iter_stream(
+    stream: TextStream,
+    contents: str,
+    config: types.GenerateContentConfig,
+    key: Optional[str],
+    shared_context: Optional[SharedContext],
+) -> Iterator[str]:
+    parts = []
+    for delta in _stream_request(stream, contents, config, shared_context):
+        parts.append(delta)
+        yield delta
+
+    for attempt in range(1, MAX_CONTINUATIONS + 1):
+        if not _needs_continuation(stream.finish_reason, config):
+            break
+        text = "".join(parts)
+        print(f"    Response cut off at the token limit ({len(text)} chars); "
+              f"continuing ({attempt}/{MAX_CONTINUATIONS})")
+        more = _stream_request(stream, _continuation_prompt(contents, text), config, shared_context)
+        for delta in _trim_overlap(text, more):
+            parts.append(delta)
+            yield delta
+
+    # Only completed streams are cached; a closed generator never gets here
+    stream.text = "".join(parts)
+    if key is not None and _is_cacheable(stream.text, config):
+        get_response_cache().put(key, stream.result().to_payload())
+
+
+def _stream_request(
+    stream: TextStream,
+    contents: str,
+    config: types.GenerateContentConfig,
+    shared_context: Optional[SharedContext],
+) -> Iterator[str]:
+    """Stream one request, accumulating its metadata on stream."""
+    if shared_context is not None:
+        contents, config = shared_context.apply(contents, config)
+
+    def open_stream():
+        # Errors surface on the first chunk; retry until the stream is flowing
+        with rate_limited("gemini", tokens=estimate_tokens(contents)):
+            chunks = get_client().models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=contents,
+                config=config,
+            )
+            first = next(chunks, None)
+        return chunks, [first] if first is not None else []
+
+    start = time.monotonic()
+    chunks, head = call_with_retry("gemini", open_stream)
+    ttft = time.monotonic() - start
+
+    earlier_tokens = stream.candidates_tokens or 0
+    stream.finish_reason = None
+    usage = None
+    for chunk in itertools.chain(head, chunks):
+        if chunk.usage_metadata:
+            usage = chunk.usage_metadata
+            if usage.candidates_token_count:
+                stream.candidates_tokens = earlier_tokens + usage.candidates_token_count
+        stream.sources = merge_sources(stream.sources, _grounding_sources(chunk))
+        stream.search_queries.extend(
+            q for q in _search_queries(chunk) if q not in stream.search_queries
+        )
+        stream.finish_reason = _finish_reason(chunk) or stream.finish_reason
+        if chunk.text:
+            yield chunk.text
+
+    record_gemini_call(GEMINI_MODEL, usage, time.monotonic() - start, ttft=ttft)
+    stream.usage = {k: stream.usage.get(k, 0) + v for k, v in _usage(usage).items()}
+
+
+def _trim_overlap(text: str, deltas: Iterator[str]) -> Iterator[str]:
+    """Pass continuation deltas through, minus any text they repeat from text's tail."""
+    head = ""
+    deltas = iter(deltas)
+    for delta in deltas:
+        head += delta
+        if len(head) >= CONTINUATION_TAIL_CHARS:
+            break
+    head = head[_overlap(text, head):]
+    if head:
+        yield head
+    yield from deltas
+
+
+def generate_with_grounding_stream(
+    prompt: str,
+    use_search: bool = True,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> TextStream:
+    """
+    Streaming variant of generate_with_grounding.
+
+    Args:
+        prompt: The prompt to send to Gemini
+        use_search: Whether to enable Google Search grounding for live info
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
+
+    Returns:
+        TextStream yielding text deltas as they arrive (a cache hit yields
+        the whole response as a single delta)
+    """
+    return _open_text_stream(
+        prompt + OUTPUT_ONLY_INSTRUCTIONS,
+        _build_config(temperature=0.7, use_search=use_search),
+        use_cache,
+        refresh_cache,
+        shared_context,
+    )
+
+
+def generate_structured_stream(
+    prompt: str,
+    response_schema: Type[BaseModel],
+    use_search: bool = False,
+    temperature: float = 0.7,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> TextStream:
+    """
+    Streaming variant of generate_structured_output.
+
+    Yields the raw JSON text as it is generated so callers can act on
+    complete sub-objects before the response finishes (see
+    src.json_stream). Shares cache entries with generate_structured_output.
+
+    Args:
+        prompt: The prompt to send
+        response_schema: Pydantic model class defining the output structure
+        use_search: Whether to enable Google Search grounding
+        temperature: Creativity level (0-1)
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
+
+    Returns:
+        TextStream yielding JSON text deltas
+    """
+    return _open_text_stream(
+        prompt,
+        _build_config(temperature, use_search, response_schema),
+        use_cache,
+        refresh_cache,
+        shared_context,
+    )
+
+
+def _open_text_stream(
+    contents: str,
+    config: types.GenerateContentConfig,
+    use_cache: bool,
+    refresh_cache: bool,
+    shared_context: Optional[SharedContext],
+) -> TextStream:
+    stream = TextStream()
+
+    use_cache = use_cache and RESPONSE_CACHE_ENABLED
+    key = _cache_key(contents, config, shared_context) if use_cache else None
+
+    if use_cache and not refresh_cache:
+        cached = _cache_lookup(key, config)
+        if cached is not None:
+            result = GenerationResult.from_payload(cached)
+            stream.from_cache = True
+            stream.text = result.text
+            stream.sources = result.sources
+            stream.search_queries = result.search_queries
+            stream.usage = result.usage
+            stream.finish_reason = result.finish_reason
+            stream._chunks = iter([result.text])
+            return stream
+
+    stream._chunks = _iter_stream(stream, contents, config, key, shared_context)
+    return stream
+
+
+# ---------------------------------------------------------------------------
+# Async API
+#
+# Built on the SDK's client.aio surface and the shared async connection pool,
+# so one event loop can drive many in-flight requests without a thread each.
+# Cancelling the awaiting task (or hitting the optional timeout) aborts the
+# in-flight HTTP request; CancelledError propagates to the caller.
+# ---------------------------------------------------------------------------
+
+
+async def _agenerate_text(
+    contents: str,
+    config: types.GenerateContentConfig,
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> str:
+    """Async counterpart of _generate_text."""
+    use_cache = use_cache and RESPONSE_CACHE_ENABLED
+    key = _cache_key(contents, config, shared_context) if use_cache else None
+
+    if use_cache and not refresh_cache:
+        cached = _cache_lookup(key, config)
+        if cached is not None:
+            return cached["text"]
+
+    result = await _arequest(contents, config, shared_context, timeout)
+    for attempt in range(1, MAX_CONTINUATIONS + 1):
+        if not _needs_continuation(result.finish_reason, config):
+            break
+        print(f"    Response cut off at the token limit ({len(result.text)} chars); "
+              f"continuing ({attempt}/{MAX_CONTINUATIONS})")
+        more = await _arequest(
+            _continuation_prompt(contents, result.text), config, shared_context, timeout
         )
+        result = _splice(result, more)
+
+    if use_cache and _is_cacheable(result.text, config):
+        get_response_cache().put(key, result.to_payload())
+    return result.text
+
+
+async def _arequest(
+    contents: str,
+    config: types.GenerateContentConfig,
+    shared_context: Optional[SharedContext],
+    timeout: Optional[float],
+) -> GenerationResult:
+    """Async counterpart of _request; timeout applies per request."""
+    if shared_context is not None:
+        contents, config = await asyncio.to_thread(shared_context.apply, contents, config)
+
+    async def request():
+        async with arate_limited("gemini", tokens=estimate_tokens(contents)):
+            return await get_client().aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=contents,
+                config=config,
+            )
+
+    start = time.monotonic()
+    if timeout is None:
+        response = await acall_with_retry("gemini", request)
+    else:
+        async with asyncio.timeout(timeout):
+            response = await acall_with_retry("gemini", request)
+    record_gemini_call(GEMINI_MODEL, response.usage_metadata, time.monotonic() - start)
+    return GenerationResult.from_response(response)
+
+
+async def agenerate_with_grounding(
+    prompt: str,
+    use_search: bool = True,
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> str:
+    """
+    Async counterpart of generate_with_grounding.
+
+    Args:
+        prompt: The prompt to send to Gemini
+        use_search: Whether to enable Google Search grounding for live info
+        timeout: Optional seconds before the request is cancelled
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
+
+    Returns:
+        Generated text response
+    """
+    return await _agenerate_text(
+        prompt + OUTPUT_ONLY_INSTRUCTIONS,
+        _build_config(temperature=0.7, use_search=use_search),
+        timeout,
+        use_cache,
+        refresh_cache,
+        shared_context,
+    )
+
+
+async def agenerate_structured_output(
+    prompt: str,
+    response_schema: Type[T],
+    use_search: bool = False,
+    temperature: float = 0.7,
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> T:
+    """
+    Async counterpart of generate_structured_output.
+
+    Args:
+        prompt: The prompt to send
+        response_schema: Pydantic model class defining the output structure
+        use_search: Whether to enable Google Search grounding
+        temperature: Creativity level (0-1)
+        timeout: Optional seconds before the request is cancelled
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
+
+    Returns:
+        Parsed Pydantic model instance
+    """
+    text = await _agenerate_text(
+        prompt,
+        _build_config(temperature, use_search, response_schema),
+        timeout,
+        use_cache,
+        refresh_cache,
+        shared_context,
     )
+    return _parse_structured(text, response_schema)
+
+
+async def agenerate_structured(
+    prompt: str,
+    temperature: float = 0.7,
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    shared_context: Optional[SharedContext] = None,
+) -> str:
+    """
+    Async counterpart of generate_structured.
+
+    Args:
+        prompt: The prompt to send
+        temperature: Creativity level (0-1)
+        timeout: Optional seconds before the request is cancelled
+        use_cache: Whether to read/write the on-disk response cache
+        refresh_cache: Skip the cache lookup but store the fresh response
+        shared_context: Optional prefix sent as Gemini cached content
 
-    return response.text
+    Returns:
+        Generated text response
+    """
+    return await _agenerate_text(
+        prompt + OUTPUT_ONLY_INSTRUCTIONS,
+        _build_config(temperature),
+        timeout,
+        use_cache,
+        refresh_cache,
+        shared_context,
+    )
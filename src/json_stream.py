@@ -0,0 +1,86 @@
+"""Incremental extraction of array items from streamed JSON."""
+
+import json
+
+
+class JsonArrayItemParser:
+    """
+    Emits the objects of a top-level array field as soon as each one closes.
+
+    Structured Gemini output for a schema like ChapterPromptList arrives as
+    {"chapters": [{...}, {...}, ...]} split across arbitrary chunk
+    boundaries. feed() scans only the new characters, tracking string and
+    escape state and container nesting, and returns every element of the
+    array under `key` that has been closed so far, decoded with json.loads.
+
+    Usage:
+        parser = JsonArrayItemParser("chapters")
+        for chunk in stream:
+            for item in parser.feed(chunk):
+                handle(item)
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._buffer = ""
+        self._pos = 0  # Next unscanned index in _buffer
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None  # Most recent string at the top level
+        self._in_array = False
+        self._item_start = None
+
+    def feed(self, text: str) -> list[dict]:
+        """Consume a chunk of JSON text and return the items it completed."""
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_key = json.loads(buffer[self._string_start:i + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                if (char == "[" and self._stack == ["{"]
+                        and self._last_key == self.key):
+                    self._in_array = True
+                elif char == "{" and self._in_array and len(self._stack) == 2:
+                    self._item_start = i
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                if char == "}" and self._item_start is not None and len(self._stack) == 2:
+                    items.append(json.loads(buffer[self._item_start:i + 1]))
+                    self._item_start = None
+                elif char == "]" and self._in_array and len(self._stack) == 1:
+                    self._in_array = False
+
+        # Drop text that can no longer be part of an item or key
+        keep_from = len(buffer)
+        for start in (self._item_start, self._string_start if self._in_string else None):
+            if start is not None:
+                keep_from = min(keep_from, start)
+        self._buffer = buffer[keep_from:]
+        self._pos = len(buffer) - keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        if self._in_string:
+            self._string_start -= keep_from
+
+        return items
+
@@ -26,13 +26,24 @@ Usage:
     python -m src.main --enhance          # Enhance + stitch
     python -m src.main --stitch           # Just stitch (use existing enhanced if available)
     python -m src.main --stitch-original  # Stitch original chapters (no enhancement)
+
+    # Incremental builds
+    python -m src.main --all --resume     # Continue an interrupted run
+    python -m src.main --all --rebuild    # Regenerate everything with fresh responses
 """
 
 import argparse
 import sys
 from pathlib import Path
 
-from src.config import validate_config, FULL_TEXT_DIR, PDF_DIR, AUDIO_DIR, CHAPTERS_DIR
+from src.config import (
+    validate_config,
+    FULL_TEXT_DIR,
+    PDF_DIR,
+    AUDIO_DIR,
+    CHAPTERS_DIR,
+    MAX_PARALLEL_CHAPTERS,
+)
 from src.pipeline import (
     load_curriculum,
     run_style_guide_generation,
@@ -43,7 +54,13 @@ from src.pipeline import (
     run_chapter_enhancement,
     run_simple_stitch,
 )
+from src import telemetry
+from src.manifest import get_manifest
+from src.checkpoint import get_journal
+from src.research_cache import get_research_cache
+from src.response_cache import get_response_cache
 from src.pdf_converter import convert_to_pdf
+from src.scheduler import TaskGraph
 from src.audiobook import generate_audiobook
 
 
@@ -59,6 +76,8 @@ Examples:
     python -m src.main --audio        Generate audiobook from existing markdown
     python -m src.main --enhance      Enhance existing chapters with more depth
     python -m src.main --stitch       Stitch chapters into final document
+    python -m src.main --all --resume Continue a run that was interrupted
+    python -m src.main --all --rebuild Regenerate everything with fresh responses
         """
     )
 
@@ -92,6 +111,36 @@ Examples:
         action="store_true",
         help="Generate chapters (requires existing style guide)"
     )
+    parser.add_argument(
+        "--enhance",
+        action="store_true",
+        help="Enhance existing chapters with more depth, then stitch"
+    )
+    parser.add_argument(
+        "--stitch",
+        action="store_true",
+        help="Stitch chapters into the final document (enhanced if available)"
+    )
+    parser.add_argument(
+        "--stitch-original",
+        action="store_true",
+        help="Stitch original chapters, ignoring enhanced versions"
+    )
+    parser.add_argument(
+        "--no-research-stage",
+        action="store_true",
+        help="Let each chapter request run its own Google Search instead of sharing researched notes"
+    )
+    parser.add_argument(
+        "--whole-chapter-drafting",
+        action="store_true",
+        help="Draft each chapter in one request instead of outline-first by section"
+    )
+    parser.add_argument(
+        "--whole-chapter-enhancement",
+        action="store_true",
+        help="Enhance each chapter in one request instead of section by section"
+    )
     parser.add_argument(
         "--use-crewai",
         action="store_true",
@@ -102,47 +151,81 @@ Examples:
         action="store_true",
         help="Disable structured outputs (use free-form text generation)"
     )
+    parser.add_argument(
+        "--max-parallel-chapters",
+        type=int,
+        default=MAX_PARALLEL_CHAPTERS,
+        help=f"Chapters to write concurrently (default: {MAX_PARALLEL_CHAPTERS}, 1 = sequential)"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Regenerate every artifact, ignoring the build manifest and requesting fresh "
+             "Gemini responses and research notes instead of reusing cached ones"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run, skipping work it already completed"
+    )
     parser.add_argument(
         "--voice-reference",
         type=str,
-        help="URL to reference audio for voice cloning in audiobook"
+        help="URL or local file of reference audio for voice cloning in audiobook"
     )
 
     args = parser.parse_args()
 
     # Default to --all if no arguments provided
     if not any([args.all, args.book, args.pdf, args.audio,
-                args.style_guide, args.chapters]):
+                args.style_guide, args.chapters, args.enhance,
+                args.stitch, args.stitch_original]):
         args.all = True
 
     try:
         # Validate configuration
         validate_config()
 
+        if args.rebuild:
+            get_manifest().force = True
+            get_response_cache().refresh = True
+            get_research_cache().ttl = 0  # Stale notes remain a fallback if re-grounding fails
+        get_journal().start(resume=args.resume)
+
         if args.all or args.book:
             print("\n" + "=" * 70)
             print("  MCP CRASH COURSE GENERATOR")
             print("  Multi-agent pipeline with Gemini + Google Search grounding")
             print("=" * 70)
 
-            # Run full book pipeline
-            markdown_path = run_full_pipeline(
+            # PDF and audiobook are independent consumers of the stitched markdown
+            graph = TaskGraph()
+            graph.add("book", lambda: run_full_pipeline(
                 use_direct_gemini=not args.use_crewai,
-                use_structured=not args.no_structured
-            )
+                use_structured=not args.no_structured,
+                max_parallel_chapters=args.max_parallel_chapters,
+                draft_by_section=not args.whole_chapter_drafting,
+                research_first=not args.no_research_stage,
+            ))
 
             if args.all:
-                # Generate PDF
-                print("\n" + "=" * 70)
-                print("  GENERATING PDF")
-                print("=" * 70)
-                convert_to_pdf()
-
-                # Generate audiobook
-                print("\n" + "=" * 70)
-                print("  GENERATING AUDIOBOOK")
-                print("=" * 70)
-                generate_audiobook(audio_prompt=args.voice_reference)
+                def generate_pdf(book):
+                    print("\n" + "=" * 70)
+                    print("  GENERATING PDF")
+                    print("=" * 70)
+                    return convert_to_pdf(Path(book))
+
+                def generate_audio(book):
+                    print("\n" + "=" * 70)
+                    print("  GENERATING AUDIOBOOK")
+                    print("=" * 70)
+                    return generate_audiobook(markdown_path=Path(book), audio_prompt=args.voice_reference)
+
+                graph.add("pdf", generate_pdf, deps=("book",))
+                graph.add("audio", generate_audio, deps=("book",))
+
+            graph.run()
+            telemetry.record_graph("outputs", graph.timings())
 
         elif args.pdf:
             markdown_path = FULL_TEXT_DIR / "mcp-crash-course.md"
@@ -163,6 +246,16 @@ Examples:
                 audio_prompt=args.voice_reference
             )
 
+        elif args.enhance:
+            run_chapter_enhancement(
+                by_section=not args.whole_chapter_enhancement,
+                use_research=not args.no_research_stage,
+            )
+            run_simple_stitch(use_enhanced=True)
+
+        elif args.stitch or args.stitch_original:
+            run_simple_stitch(use_enhanced=not args.stitch_original)
+
         elif args.style_guide:
             curriculum = load_curriculum()
             run_style_guide_generation(curriculum)
@@ -202,6 +295,12 @@ Examples:
         if args.all or args.audio:
             print(f"  Audiobook: {AUDIO_DIR / 'mcp-crash-course.mp3'}")
 
+        print("\n" + "=" * 70)
+        print("  RUN SUMMARY")
+        print("=" * 70)
+        telemetry.print_summary()
+        print(f"\nRun report: {telemetry.write_report()}")
+
     except ValueError as e:
         print(f"\nConfiguration Error:\n{e}")
         sys.exit(1)
@@ -0,0 +1,117 @@
+"""Content-hash manifest for make-style incremental builds."""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from src.config import MANIFEST_FILE, OUTPUTS_DIR, REBUILD_ALL
+
+
+def fingerprint(value: Any) -> str:
+    """
+    Hash a build input.
+
+    Paths are hashed by file content (a missing file hashes to "missing"),
+    strings and bytes by value, anything else by its sorted JSON encoding.
+    """
+    if isinstance(value, Path):
+        if not value.exists():
+            return "missing"
+        data = value.read_bytes()
+    elif isinstance(value, bytes):
+        data = value
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        data = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint_inputs(inputs: dict[str, Any]) -> dict[str, str]:
+    """Hash each named input separately, so Path inputs are hashed by content."""
+    return {name: fingerprint(value) for name, value in inputs.items()}
+
+
+class BuildManifest:
+    """
+    Records, for each artifact, the hashes of the inputs it was built from.
+
+    An artifact is up to date when its recorded input hashes match the
+    current ones and all of its output files still exist. Phases check
+    is_fresh() before doing work and call record() after writing outputs, so
+    a run only rebuilds artifacts whose inputs changed and, through the
+    hashes of those outputs, everything downstream of them.
+    """
+
+    def __init__(self, path: Path = MANIFEST_FILE, force: bool = REBUILD_ALL):
+        self.path = Path(path)
+        self.force = force
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text()).get("artifacts", {})
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps({"artifacts": self._entries}, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _relative(path: Path) -> str:
+        try:
+            return str(Path(path).resolve().relative_to(OUTPUTS_DIR.resolve()))
+        except ValueError:
+            return str(path)
+
+    def is_fresh(self, artifact: str, inputs: dict[str, Any], outputs: list[Path]) -> bool:
+        """
+        Check whether an artifact can be reused as-is.
+
+        Args:
+            artifact: Stable artifact name (e.g. "chapter-03")
+            inputs: Everything the artifact depends on, by name
+            outputs: Files the artifact consists of
+
+        Returns:
+            True if the inputs are unchanged and every output exists
+        """
+        if self.force:
+            return False
+        with self._lock:
+            entry = self._load().get(artifact)
+        if entry is None:
+            return False
+        return entry["inputs"] == fingerprint_inputs(inputs) and all(Path(p).exists() for p in outputs)
+
+    def record(self, artifact: str, inputs: dict[str, Any], outputs: list[Path]):
+        """Store the input and output hashes of a freshly built artifact."""
+        entry = {
+            "inputs": fingerprint_inputs(inputs),
+            "outputs": {self._relative(p): fingerprint(Path(p)) for p in outputs},
+            "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._load()[artifact] = entry
+            self._save()
+
+
+_manifest = None
+
+
+def get_manifest() -> BuildManifest:
+    """Return the process-wide build manifest."""
+    global _manifest
+    if _manifest is None:
+        _manifest = BuildManifest()
+    return _manifest
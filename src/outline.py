@@ -0,0 +1,138 @@
+"""Outline-first chapter drafting: plan sections with a fast model, then draft them concurrently."""
+
+import json
+from typing import Optional
+
+from src.config import GEMINI_MODEL_FAST
+from src.gemini_client import generate_structured_output
+from src.schemas import ChapterOutline
+
+
+def build_outline_prompt(chapter: dict) -> str:
+    """Build the planning prompt for a chapter's section outline."""
+    return f"""Plan the sections of Chapter {chapter['chapter_number']}: {chapter['title']}
+of a PRINTED TECHNICAL BOOK about MCP (Model Context Protocol).
+
+CHAPTER BRIEF:
+{json.dumps(chapter, indent=2)}
+
+Produce 4-7 sections in reading order that together answer every core question
+and cover every key concept, examples and controversies in the brief. Each point
+belongs to exactly one section. The whole chapter should be 3000-5000 words;
+distribute target_words across sections accordingly."""
+
+
+def outline_chapter(chapter: dict) -> ChapterOutline:
+    """
+    Plan a chapter's sections with a single fast structured call.
+
+    Args:
+        chapter: Chapter prompt dict (see schemas.ChapterPrompt)
+
+    Returns:
+        Section outline for the chapter
+    """
+    return generate_structured_output(
+        build_outline_prompt(chapter),
+        ChapterOutline,
+        temperature=0.4,
+        model=GEMINI_MODEL_FAST,
+    )
+
+
+def describe_outline(outline: ChapterOutline) -> str:
+    """Render an outline as a compact plan for section requests."""
+    lines = [f"Opening: {outline.introduction}"]
+    for i, section in enumerate(outline.sections, 1):
+        lines.append(f"{i}. ### {section.heading} - {section.summary}")
+    return "\n".join(lines)
+
+
+def build_section_request(
+    chapter: dict,
+    outline: ChapterOutline,
+    index: Optional[int],
+    figure_placeholder: Optional[str] = None,
+    research_notes: Optional[str] = None,
+) -> str:
+    """
+    Build the request for one part of an outlined chapter.
+
+    Args:
+        chapter: Chapter prompt dict
+        outline: Outline from outline_chapter
+        index: Section index into outline.sections, or None for the opening
+               paragraphs under the chapter heading
+        figure_placeholder: Optional image placeholder markdown to include
+        research_notes: Optional pre-researched notes to draw current facts from
+
+    Returns:
+        Prompt text for the section
+    """
+    header = f"""Chapter {chapter['chapter_number']}: {chapter['title']}
+
+CHAPTER BRIEF:
+{json.dumps(chapter, indent=2)}
+
+CHAPTER PLAN (other parts are being written separately):
+{describe_outline(outline)}
+"""
+    if research_notes:
+        header += f"""
+RESEARCH NOTES (current, from web search; use what is relevant to this part):
+{research_notes}
+"""
+
+    if index is None:
+        request = f"""
+Write ONLY the opening of the chapter: two to four paragraphs of substantive
+technical prose that establish: {outline.introduction}
+Do not include any heading (the chapter heading is added separately) and do
+not preview the sections one by one."""
+    else:
+        section = outline.sections[index]
+        key_points = "\n".join(f"- {point}" for point in section.key_points)
+        request = f"""
+Write ONLY section {index + 1}: {section.heading}
+Covers: {section.summary}
+Must include:
+{key_points}
+Target length: about {section.target_words} words.
+
+Start with the line "### {section.heading}" and use #### for any subsections.
+Do not repeat material that belongs to other sections of the plan."""
+
+    if figure_placeholder:
+        request += f"""
+
+Include this image placeholder exactly once, where it fits best:
+{figure_placeholder}"""
+
+    return header + request
+
+
+def align_to_heading(text: str, heading: Optional[str]) -> str:
+    """
+    Trim anything a model put before a section's heading.
+
+    Args:
+        text: Generated section text
+        heading: Expected first line (e.g. "### Transport"), or None for
+                 headless text
+
+    Returns:
+        Section text starting with the heading (added if it was missing)
+    """
+    text = text.strip()
+    if heading is None:
+        return text
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        if line.strip() == heading:
+            return "\n".join(lines[i:]).strip()
+    return f"{heading}\n\n{text}"
+
+
+def assemble_chapter(title: str, opening: str, sections: list[str]) -> str:
+    """Merge drafted parts, in outline order, under the chapter heading."""
+    return "\n\n".join([f"## {title}", opening, *sections]) + "\n"
@@ -5,6 +5,7 @@ import markdown
 from weasyprint import HTML, CSS
 
 from src.config import FULL_TEXT_DIR, PDF_DIR
+from src.checkpoint import is_built, mark_built
 
 
 # CSS for the PDF
@@ -230,6 +231,11 @@ def convert_to_pdf(
     if output_path is None:
         output_path = PDF_DIR / "mcp-crash-course.pdf"
 
+    inputs = {"markdown": markdown_path, "styles": PDF_STYLES}
+    if is_built("pdf", inputs, [output_path]):
+        print(f"PDF up to date, reusing: {output_path}")
+        return output_path
+
     print(f"Converting {markdown_path} to PDF...")
 
     # Read markdown
@@ -243,6 +249,7 @@ def convert_to_pdf(
     css = CSS(string=PDF_STYLES)
 
     html.write_pdf(output_path, stylesheets=[css])
+    mark_built("pdf", inputs, [output_path])
 
     print(f"PDF saved to: {output_path}")
     return output_path
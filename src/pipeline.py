@@ -1,7 +1,14 @@
 """Main pipeline orchestration for the MCP crash course generator."""
 
+import contextvars
 import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Callable, Iterable
 from crewai import Crew, Process
 
 from src.config import (
@@ -10,6 +17,15 @@ from src.config import (
     CHAPTER_PROMPTS_DIR,
     CHAPTERS_DIR,
     FULL_TEXT_DIR,
+    GEMINI_MODEL,
+    MAX_PARALLEL_CHAPTERS,
+    DRAFT_BY_SECTION,
+    ENHANCE_BY_SECTION,
+    RESEARCH_BEFORE_WRITING,
+    GEMINI_MODEL_FAST,
+    MAX_PARALLEL_SECTIONS,
+    PREAMBLE_GUARD_WINDOW,
+    PREAMBLE_GUARD_RETRIES,
 )
 from src.tasks import (
     create_style_guide_task,
@@ -18,8 +34,80 @@ from src.tasks import (
     create_stitching_task,
 )
 import re
-from src.gemini_client import generate_with_grounding, generate_structured_output
-from src.schemas import ChapterPromptList, ChapterContent, StyleGuide
+from src.gemini_client import (
+    GenerationResult,
+    SharedContext,
+    TextStream,
+    generate_with_grounding_result,
+    generate_with_grounding_stream,
+    generate_structured_output,
+    generate_structured_result,
+    generate_structured_stream,
+    merge_sources,
+    get_connection_stats,
+    get_cache_stats,
+)
+from src import telemetry
+from src.checkpoint import is_built, mark_built
+from src.resilience import run_with_retry, submit_with_retry, INVALID_OUTPUT_POLICIES
+from src.json_stream import JsonArrayItemParser
+from src.outline import (
+    align_to_heading,
+    assemble_chapter,
+    build_outline_prompt,
+    build_section_request,
+    outline_chapter,
+)
+from src.research import ResearchStage
+from src.research_cache import get_research_cache
+from src.scheduler import TaskGraph
+from src.schemas import ChapterPrompt, ChapterPromptList, ChapterContent, StyleGuide
+
+
+# Patterns that indicate preamble (matched case-insensitively against stripped lines)
+PREAMBLE_PATTERNS = [
+    r'^(okay|ok|sure|alright|certainly|absolutely)',
+    r'^(welcome|hello|hi|hey)\b',
+    r'^(in this chapter|let\'s|we\'ll|we will|i will|i\'ll)',
+    r'^(here is|here\'s|below is)',
+    r'^(this chapter|the following)',
+    r'^(great|perfect|excellent)[\s,!]',
+    r'^(get ready|ready to|prepared to)',
+    r'^(have you ever|did you know)',
+    r'^(imagine|picture this)',
+    r'^(before we|as we)',
+    r'^(now that|so far)',
+    r'^(are you|do you)',
+    r'^(glad|happy|pleased|excited)',
+    r'^\*\*welcome',  # Bold welcome
+    r'^_welcome',  # Italic welcome
+]
+
+# Openers from the ChapterContent FORBIDDEN list that strip_preamble cannot fix
+# because they appear in the first paragraph after the chapter heading
+FORBIDDEN_OPENER_PATTERNS = [
+    r'^[*_]*(welcome|hello|hi there)\b',
+    r'^(in this (chapter|section)|this chapter (will|explores|covers))',
+    r'^(let\'s|let us|we\'ll|we will|you\'ll|you will)\b',
+    r'^(have you ever|did you know|imagine)\b',
+    r'^(get started|getting started|get ready)\b',
+]
+
+# Appended to the prompt when a generation is aborted for a forbidden opener
+STRICT_OPENING_INSTRUCTIONS = """
+
+A previous attempt was rejected because its opening began with "{opener}".
+The first paragraph after the ## heading MUST be a declarative technical statement
+about the subject. Do NOT open with a greeting, "In this chapter", "Let's", "We'll",
+"You will", or a question."""
+
+
+class ForbiddenOpenerError(Exception):
+    """Raised when a streaming generation opens with a forbidden phrase."""
+
+    def __init__(self, opener: str):
+        super().__init__(f"Forbidden opener: {opener!r}")
+        self.opener = opener
 
 
 def strip_preamble(content: str) -> str:
@@ -31,25 +119,6 @@ def strip_preamble(content: str) -> str:
     """
     lines = content.split('\n')
 
-    # Patterns that indicate preamble (case-insensitive)
-    preamble_patterns = [
-        r'^(okay|ok|sure|alright|certainly|absolutely)',
-        r'^(welcome|hello|hi|hey)\b',
-        r'^(in this chapter|let\'s|we\'ll|we will|i will|i\'ll)',
-        r'^(here is|here\'s|below is)',
-        r'^(this chapter|the following)',
-        r'^(great|perfect|excellent)[\s,!]',
-        r'^(get ready|ready to|prepared to)',
-        r'^(have you ever|did you know)',
-        r'^(imagine|picture this)',
-        r'^(before we|as we)',
-        r'^(now that|so far)',
-        r'^(are you|do you)',
-        r'^(glad|happy|pleased|excited)',
-        r'^\*\*welcome',  # Bold welcome
-        r'^_welcome',  # Italic welcome
-    ]
-
     # Find first line that looks like actual content (heading or substantial text)
     start_idx = 0
     for i, line in enumerate(lines):
@@ -65,7 +134,7 @@ def strip_preamble(content: str) -> str:
             break
 
         # Check if line matches preamble patterns
-        is_preamble = any(re.match(p, stripped) for p in preamble_patterns)
+        is_preamble = any(re.match(p, stripped) for p in PREAMBLE_PATTERNS)
 
         if not is_preamble:
             # This looks like real content
@@ -81,11 +150,228 @@ def strip_preamble(content: str) -> str:
     return result.lstrip('\n')
 
 
+def find_forbidden_opener(text: str, complete: bool = False) -> tuple[bool, str]:
+    """
+    Inspect the opening of a (possibly partial) generation.
+
+    Preamble lines before the first heading are ignored, since strip_preamble
+    removes them cheaply; the first prose line is checked against
+    FORBIDDEN_OPENER_PATTERNS.
+
+    Args:
+        text: Text generated so far
+        complete: Whether text is the whole generation
+
+    Returns:
+        (decided, opener): decided is False while the first prose line is
+        still incomplete; opener is the offending line, or "" if acceptable
+    """
+    lines = text.split('\n')
+    if not complete:
+        lines = lines[:-1]  # The last line may still be growing
+
+    seen_heading = False
+    for line in lines:
+        stripped = line.strip().lower()
+        if not stripped:
+            continue
+        if stripped.startswith('#'):
+            seen_heading = True
+            continue
+        if not seen_heading and any(re.match(p, stripped) for p in PREAMBLE_PATTERNS):
+            continue
+        if any(re.match(p, stripped) for p in FORBIDDEN_OPENER_PATTERNS):
+            return True, line.strip()
+        return True, ""
+
+    # Past the window without any prose line: nothing left worth guarding
+    return complete or len(text) >= PREAMBLE_GUARD_WINDOW, ""
+
+
+def write_stream(
+    stream: TextStream,
+    output_path: Path,
+    postprocess: Callable[[str], str] = None,
+    guard: bool = False,
+) -> str:
+    """
+    Write a streaming generation to disk as it arrives.
+
+    Deltas are appended to ``<output_path>.partial`` and flushed, so an
+    interrupted generation keeps everything received so far. On completion
+    the (optionally post-processed) text atomically replaces output_path.
+
+    Args:
+        stream: Text deltas from generate_with_grounding_stream
+        output_path: Final destination
+        postprocess: Optional cleanup applied to the full text before the rename
+        guard: Hold back the opening until find_forbidden_opener accepts it;
+               abort the request on a forbidden opener
+
+    Returns:
+        The final text
+
+    Raises:
+        ForbiddenOpenerError: If guard is set and the opening is rejected
+    """
+    partial_path = output_path.with_name(output_path.name + ".partial")
+    start = time.monotonic()
+    first_byte = None
+    parts = []
+    pending = guard  # Deltas stay in memory until the opening is accepted
+    opener = ""
+
+    with open(partial_path, "w") as f:
+        for delta in stream:
+            if first_byte is None:
+                first_byte = time.monotonic() - start
+            parts.append(delta)
+
+            if pending:
+                decided, opener = find_forbidden_opener("".join(parts))
+                if opener:
+                    stream.close()
+                    break
+                if not decided:
+                    continue
+                pending = False
+                delta = "".join(parts)
+
+            f.write(delta)
+            f.flush()
+
+        if pending and not opener:
+            # Stream ended inside the guard window
+            _, opener = find_forbidden_opener("".join(parts), complete=True)
+            if not opener:
+                f.write("".join(parts))
+
+    if opener:
+        partial_path.unlink(missing_ok=True)
+        raise ForbiddenOpenerError(opener)
+
+    elapsed = time.monotonic() - start
+    text = "".join(parts)
+
+    if postprocess is not None:
+        text = postprocess(text)
+        partial_path.write_text(text)
+    os.replace(partial_path, output_path)
+
+    if stream.from_cache:
+        print("    Streamed: served from response cache")
+    else:
+        tokens = stream.candidates_tokens or len(text) // 4
+        print(f"    Streamed: first byte {first_byte or 0:.1f}s, "
+              f"{tokens} tokens in {elapsed:.1f}s ({tokens / max(elapsed, 1e-6):.1f} tok/s)")
+
+    return text
+
+
+def write_guarded_stream(
+    make_stream: Callable[[str], TextStream],
+    output_path: Path,
+    postprocess: Callable[[str], str] = None,
+    retries: int = PREAMBLE_GUARD_RETRIES,
+) -> str:
+    """
+    Stream a generation to disk, retrying with a stricter prompt on a forbidden opener.
+
+    Args:
+        make_stream: Starts the generation; receives extra prompt instructions
+                     ("" on the first attempt)
+        output_path: Final destination
+        postprocess: Optional cleanup applied before the final rename
+        retries: Aborted attempts allowed before the last, unguarded attempt
+
+    Returns:
+        The final text
+    """
+    extra = ""
+    for _ in range(retries):
+        try:
+            return write_stream(make_stream(extra), output_path, postprocess, guard=True)
+        except ForbiddenOpenerError as e:
+            print(f"    Aborted after opening {e.opener[:60]!r}; retrying with stricter prompt")
+            extra = STRICT_OPENING_INSTRUCTIONS.format(opener=e.opener[:80])
+
+    # Last attempt is accepted as-is and left to postprocess
+    return write_stream(make_stream(extra), output_path, postprocess)
+
+
+def generate_guarded(
+    generate: Callable[[str], GenerationResult],
+    retries: int = PREAMBLE_GUARD_RETRIES,
+) -> GenerationResult:
+    """
+    Run a blocking generation, retrying with a stricter prompt on a forbidden opener.
+
+    The non-streaming counterpart of write_guarded_stream, for short section
+    requests whose text is only written once the whole chapter is assembled.
+
+    Args:
+        generate: Runs the generation; receives extra prompt instructions
+                  ("" on the first attempt)
+        retries: Rejected attempts allowed before the last, unchecked attempt
+
+    Returns:
+        The accepted response
+    """
+    extra = ""
+    for _ in range(retries):
+        result = generate(extra)
+        _, opener = find_forbidden_opener(result.text, complete=True)
+        if not opener:
+            return result
+        print(f"    Rejected opening {opener[:60]!r}; retrying with stricter prompt")
+        extra = STRICT_OPENING_INSTRUCTIONS.format(opener=opener[:80])
+
+    # Last attempt is accepted as-is and left to strip_preamble
+    return generate(extra)
+
+
+def save_chapter_sources(
+    chapter_num: int,
+    results: Iterable[GenerationResult],
+    research_notes: Iterable[dict] = (),
+) -> Path:
+    """
+    Write a chapter's sources from response grounding metadata.
+
+    Args:
+        chapter_num: Chapter number (names chapter-XX-sources.json)
+        results: Responses the chapter was generated from
+        research_notes: Research notes injected into the chapter's prompts
+                        (see ResearchStage.notes); their sources are included
+
+    Returns:
+        Path of the sources file
+    """
+    results = list(results)
+    research_notes = list(research_notes)
+    queries = []
+    for result in results:
+        queries.extend(q for q in result.search_queries if q not in queries)
+
+    sources_path = CHAPTERS_DIR / f"chapter-{chapter_num:02d}-sources.json"
+    sources_path.write_text(json.dumps({
+        "chapter": chapter_num,
+        "sources": merge_sources(
+            *(result.sources for result in results),
+            *(note["sources"] for note in research_notes),
+        ),
+        "search_queries": queries,
+        "research_topics": [note["topic"] for note in research_notes],
+    }, indent=2))
+    return sources_path
+
+
 def load_curriculum() -> str:
     """Load the curriculum from file."""
     return CURRICULUM_FILE.read_text()
 
 
+@telemetry.phase("style_guide")
 def run_style_guide_generation(curriculum: str) -> str:
     """Generate the style guide."""
     print("\n" + "=" * 60)
@@ -111,6 +397,7 @@ def run_style_guide_generation(curriculum: str) -> str:
     return style_guide
 
 
+@telemetry.phase("curriculum_analysis")
 def run_curriculum_analysis(curriculum: str) -> list[dict]:
     """Analyze curriculum and generate chapter prompts."""
     print("\n" + "=" * 60)
@@ -148,6 +435,7 @@ def run_curriculum_analysis(curriculum: str) -> list[dict]:
     return chapter_prompts
 
 
+@telemetry.phase("chapters")
 def run_chapter_writing_with_research(
     chapter_prompts: list[dict],
     style_guide: str,
@@ -157,20 +445,9 @@ def run_chapter_writing_with_research(
     print("PHASE 3: Writing Chapters with Live Research")
     print("=" * 60 + "\n")
 
-    chapters = []
-
-    for i, prompt in enumerate(chapter_prompts, 1):
-        chapter_num = prompt.get("chapter_number", i)
-        chapter_title = prompt.get("title", f"Chapter {i}")
-
-        print(f"\n--- Writing Chapter {chapter_num}: {chapter_title} ---\n")
-
-        # Build the research-enabled prompt
-        writing_prompt = f"""You are writing Chapter {chapter_num}: {chapter_title} for
-        an MCP (Model Context Protocol) crash course.
-
-        CHAPTER REQUIREMENTS:
-        {json.dumps(prompt, indent=2)}
+    # Shared instructions and style guide, uploaded once as cached content
+    context = SharedContext(
+        f"""You are writing chapters of an MCP (Model Context Protocol) crash course.
 
         STYLE GUIDE (follow precisely):
         {style_guide}
@@ -182,23 +459,61 @@ def run_chapter_writing_with_research(
         4. Address any controversies or debates fairly
         5. Follow the style guide exactly for formatting and tone
         6. Target 1500-2500 words
-        7. Include code examples where relevant
+        7. Include code examples where relevant""",
+        display_name="chapter-writing-research",
+        use_search=True,
+    )
 
-        Write the complete chapter in markdown format."""
+    chapters = []
 
-        # Use Gemini with Google Search grounding
-        chapter_content = generate_with_grounding(writing_prompt, use_search=True)
-        chapters.append(chapter_content)
-
-        # Save individual chapter
-        safe_title = chapter_title.lower().replace(" ", "-").replace("/", "-")
-        output_path = CHAPTERS_DIR / f"chapter-{chapter_num:02d}-{safe_title}.md"
-        output_path.write_text(chapter_content)
-        print(f"Chapter saved to: {output_path}")
+    with context:
+        for i, prompt in enumerate(chapter_prompts, 1):
+            chapter_num = prompt.get("chapter_number", i)
+            chapter_title = prompt.get("title", f"Chapter {i}")
+
+            # Build the research-enabled prompt
+            writing_prompt = f"""You are writing Chapter {chapter_num}: {chapter_title}.
+
+            CHAPTER REQUIREMENTS:
+            {json.dumps(prompt, indent=2)}
+
+            Write the complete chapter in markdown format."""
+
+            safe_title = chapter_title.lower().replace(" ", "-").replace("/", "-")
+            output_path = CHAPTERS_DIR / f"chapter-{chapter_num:02d}-{safe_title}.md"
+            artifact = f"chapter-{chapter_num:02d}"
+            inputs = {
+                "context": context.text,
+                "prompt": writing_prompt,
+                "model": GEMINI_MODEL,
+                "params": {"use_search": True},
+            }
+            if is_built(artifact, inputs, [output_path]):
+                print(f"Chapter {chapter_num} up to date, reusing: {output_path}")
+                chapters.append(output_path.read_text())
+                continue
+
+            print(f"\n--- Writing Chapter {chapter_num}: {chapter_title} ---\n")
+
+            # Stream from Gemini with Google Search grounding straight to disk
+            streams = []
+
+            def start_stream(extra):
+                streams.append(generate_with_grounding_stream(
+                    writing_prompt + extra, use_search=True, shared_context=context
+                ))
+                return streams[-1]
+
+            chapter_content = write_guarded_stream(start_stream, output_path)
+            save_chapter_sources(chapter_num, [streams[-1].result()])
+            mark_built(artifact, inputs, [output_path])
+            chapters.append(chapter_content)
+            print(f"Chapter saved to: {output_path}")
 
     return chapters
 
 
+@telemetry.phase("chapters")
 def run_chapter_writing_crew(
     chapter_prompts: list[dict],
     style_guide: str,
@@ -243,6 +558,7 @@ def run_chapter_writing_crew(
     return chapters
 
 
+@telemetry.phase("stitching")
 def run_document_stitching(chapters: list[str], style_guide: str) -> str:
     """Stitch chapters into final document."""
     print("\n" + "=" * 60)
@@ -268,6 +584,7 @@ def run_document_stitching(chapters: list[str], style_guide: str) -> str:
     return final_document
 
 
+@telemetry.phase("style_guide")
 def run_style_guide_structured(curriculum: str) -> str:
     """Generate style guide using Gemini structured output."""
     print("\n" + "=" * 60)
@@ -322,18 +639,47 @@ def run_style_guide_structured(curriculum: str) -> str:
 
     The full_guide field should contain the complete style guide in markdown."""
 
+    output_path = STYLE_GUIDE_DIR / "style-guide.md"
+    inputs = {
+        "curriculum": curriculum,
+        "prompt": prompt,
+        "schema": StyleGuide.model_json_schema(),
+        "model": GEMINI_MODEL,
+        "params": {"temperature": 0.7},
+    }
+    if is_built("style-guide", inputs, [output_path]):
+        print(f"Style guide up to date, reusing: {output_path}")
+        return output_path.read_text()
+
     result = generate_structured_output(prompt, StyleGuide)
 
     # Save style guide
-    output_path = STYLE_GUIDE_DIR / "style-guide.md"
     output_path.write_text(result.full_guide)
+    mark_built("style-guide", inputs, [output_path])
     print(f"Style guide saved to: {output_path}")
 
     return result.full_guide
 
 
-def run_curriculum_analysis_structured(curriculum: str) -> list[dict]:
-    """Analyze curriculum using Gemini structured output."""
+@telemetry.phase("curriculum_analysis")
+def run_curriculum_analysis_structured(
+    curriculum: str,
+    on_prompt: Callable[[dict], None] = None,
+) -> list[dict]:
+    """
+    Analyze curriculum using Gemini structured output.
+
+    The JSON response is streamed and parsed incrementally, so each chapter
+    prompt is handed to on_prompt as soon as its object closes, while later
+    prompts are still being generated.
+
+    Args:
+        curriculum: Curriculum text
+        on_prompt: Optional callback receiving each chapter prompt dict
+
+    Returns:
+        All chapter prompt dicts
+    """
     print("\n" + "=" * 60)
     print("PHASE 2: Analyzing Curriculum (Structured Output)")
     print("=" * 60 + "\n")
@@ -362,161 +708,364 @@ def run_curriculum_analysis_structured(curriculum: str) -> list[dict]:
     - Connections to other chapters
     - Any controversies to address"""
 
-    result = generate_structured_output(prompt, ChapterPromptList)
+    output_path = CHAPTER_PROMPTS_DIR / "chapter-prompts.json"
+    inputs = {
+        "curriculum": curriculum,
+        "prompt": prompt,
+        "schema": ChapterPromptList.model_json_schema(),
+        "model": GEMINI_MODEL,
+        "params": {"temperature": 0.7},
+    }
+    if is_built("chapter-prompts", inputs, [output_path]):
+        chapter_prompts = json.loads(output_path.read_text())
+        print(f"Chapter prompts up to date, reusing {len(chapter_prompts)} from: {output_path}")
+        for chapter_prompt in chapter_prompts:
+            if on_prompt is not None:
+                on_prompt(chapter_prompt)
+        return chapter_prompts
+
+    parser = JsonArrayItemParser("chapters")
+    parts = []
+    for delta in generate_structured_stream(prompt, ChapterPromptList):
+        parts.append(delta)
+        for item in parser.feed(delta):
+            chapter_prompt = ChapterPrompt.model_validate(item).model_dump()
+            print(f"Chapter prompt ready: {chapter_prompt['chapter_number']}. {chapter_prompt['title']}")
+            if on_prompt is not None:
+                on_prompt(chapter_prompt)
+
+    # Validate the complete response as before
+    result = ChapterPromptList.model_validate_json("".join(parts))
 
     # Convert to list of dicts for compatibility
     chapter_prompts = [ch.model_dump() for ch in result.chapters]
 
     # Save chapter prompts
-    output_path = CHAPTER_PROMPTS_DIR / "chapter-prompts.json"
     output_path.write_text(json.dumps(chapter_prompts, indent=2))
+    mark_built("chapter-prompts", inputs, [output_path])
     print(f"Chapter prompts saved to: {output_path}")
     print(f"Generated {len(chapter_prompts)} chapters")
 
     return chapter_prompts
 
 
-def run_chapter_writing_structured(
-    chapter_prompts: list[dict],
-    style_guide: str,
-) -> list[str]:
-    """Write chapters using Gemini structured output with search grounding."""
-    print("\n" + "=" * 60)
-    print("PHASE 3: Writing Chapters (Structured Output + Search)")
-    print("=" * 60 + "\n")
-
-    chapters = []
-
-    for i, prompt in enumerate(chapter_prompts, 1):
-        chapter_num = prompt.get("chapter_number", i)
-        chapter_title = prompt.get("title", f"Chapter {i}")
+def build_structured_chapter_context(style_guide: str, by_section: bool = False) -> str:
+    """
+    Build the prompt prefix shared by every structured chapter request.
 
-        print(f"\n--- Writing Chapter {chapter_num}: {chapter_title} ---\n")
+    Holds the style guide and book format rules; it is identical across
+    chapters so it can be sent once as Gemini cached content.
 
-        writing_prompt = f"""Write Chapter {chapter_num}: {chapter_title} for a PRINTED TECHNICAL BOOK about MCP.
+    Args:
+        style_guide: Style guide text
+        by_section: Rules for drafting single sections of an outlined
+                    chapter instead of whole chapters
+    """
+    if by_section:
+        opening_rule = ("Start each section with its ### heading exactly as given in the request "
+                        "(the chapter opening has no heading)")
+        length_rule = "Write each part to the target length given in the request"
+    else:
+        opening_rule = "Start content with: ## followed by the chapter title given in the request"
+        length_rule = "Target 1500-2500 words"
+
+    return f"""You are writing chapters of a PRINTED TECHNICAL BOOK about MCP.
+
+    STYLE GUIDE:
+    {style_guide}
+
+    === CRITICAL: BOOK FORMAT RULES ===
+
+    This is a PRINTED TECHNICAL BOOK like "The C Programming Language" or "Design Patterns".
+    It is NOT a blog post, YouTube video, tutorial, or online course.
+
+    MANDATORY:
+    1. {opening_rule}
+    2. First paragraph after heading must be substantive technical prose
+    3. Write in third person or imperative mood, not "we" or "you"
+    4. Use formal technical writing style throughout
+
+    ABSOLUTELY FORBIDDEN (will cause rejection):
+    - "Welcome" / "Hello" / "Hi there"
+    - "In this chapter, we'll..." / "Let's explore..." / "We'll dive into..."
+    - "Get started" / "Getting started" / "Let's get started"
+    - "Journey" / "Adventure" / "Exciting"
+    - "Click" / "Scroll" / "Navigate to"
+    - "In the previous chapter" / "As we saw before"
+    - Any second-person address ("you will learn", "you'll discover")
+    - Rhetorical questions as openers ("Have you ever wondered...?")
+    - Exclamation marks in prose
+
+    GOOD OPENING EXAMPLES:
+    - "The Model Context Protocol defines a standardized interface..."
+    - "Security in MCP deployments requires careful consideration of..."
+    - "MCP transport mechanisms fall into two primary categories..."
+
+    BAD OPENING EXAMPLES (DO NOT USE):
+    - "Welcome back! In this chapter, we'll explore..."
+    - "Let's dive into the exciting world of..."
+    - "Have you ever wondered how MCP handles...?"
+    - "In this section, you'll learn about..."
+
+    === CONTENT REQUIREMENTS ===
+    - Research current MCP information (2024-2025)
+    - Include specific tools, implementations, code examples
+    - Address controversies objectively
+    - {length_rule}
+    - Use markdown formatting appropriately"""
+
+
+def draft_chapter_by_section(
+    prompt: dict,
+    chapter_title: str,
+    context: SharedContext,
+    executor: ThreadPoolExecutor,
+    research_notes: str = None,
+) -> tuple[str, list[GenerationResult]]:
+    """
+    Draft a chapter outline-first: plan its sections, then write them concurrently.
 
-        CHAPTER BRIEF:
-        {json.dumps(prompt, indent=2)}
+    Args:
+        prompt: Chapter prompt dict
+        chapter_title: Title used for the ## heading
+        context: Shared style guide and section format rules
+                 (see build_structured_chapter_context with by_section=True)
+        executor: Pool the section requests run on
+        research_notes: Pre-researched notes; when given, sections are
+                        written without Google Search
 
-        STYLE GUIDE:
-        {style_guide}
+    Returns:
+        Merged chapter content under "## {chapter_title}", and the section
+        responses (for their grounding metadata)
+    """
+    start = time.monotonic()
+    outline = outline_chapter(prompt)
+    outlined = time.monotonic() - start
+    print(f"    Outlined {len(outline.sections)} sections in {outlined:.1f}s")
+
+    def draft(index):
+        request = build_section_request(prompt, outline, index, research_notes=research_notes)
+        return generate_guarded(lambda extra: generate_with_grounding_result(
+            request + extra,
+            use_search=research_notes is None,
+            shared_context=context,
+        ))
+
+    indices = [None, *range(len(outline.sections))]
+    futures = [executor.submit(contextvars.copy_context().run, draft, i) for i in indices]
+    try:
+        results = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    print(f"    Drafted {len(outline.sections)} sections in {time.monotonic() - start - outlined:.1f}s")
+
+    opening = strip_preamble(results[0].text).strip()
+    sections = [
+        align_to_heading(result.text, f"### {section.heading}")
+        for section, result in zip(outline.sections, results[1:])
+    ]
+    return assemble_chapter(chapter_title, opening, sections), results
 
-        === CRITICAL: BOOK FORMAT RULES ===
-
-        This is a PRINTED TECHNICAL BOOK like "The C Programming Language" or "Design Patterns".
-        It is NOT a blog post, YouTube video, tutorial, or online course.
-
-        MANDATORY:
-        1. Start content with: ## {chapter_title}
-        2. First paragraph after heading must be substantive technical prose
-        3. Write in third person or imperative mood, not "we" or "you"
-        4. Use formal technical writing style throughout
-
-        ABSOLUTELY FORBIDDEN (will cause rejection):
-        - "Welcome" / "Hello" / "Hi there"
-        - "In this chapter, we'll..." / "Let's explore..." / "We'll dive into..."
-        - "Get started" / "Getting started" / "Let's get started"
-        - "Journey" / "Adventure" / "Exciting"
-        - "Click" / "Scroll" / "Navigate to"
-        - "In the previous chapter" / "As we saw before"
-        - Any second-person address ("you will learn", "you'll discover")
-        - Rhetorical questions as openers ("Have you ever wondered...?")
-        - Exclamation marks in prose
-
-        GOOD OPENING EXAMPLES:
-        - "The Model Context Protocol defines a standardized interface..."
-        - "Security in MCP deployments requires careful consideration of..."
-        - "MCP transport mechanisms fall into two primary categories..."
-
-        BAD OPENING EXAMPLES (DO NOT USE):
-        - "Welcome back! In this chapter, we'll explore..."
-        - "Let's dive into the exciting world of..."
-        - "Have you ever wondered how MCP handles...?"
-        - "In this section, you'll learn about..."
-
-        === CONTENT REQUIREMENTS ===
-        - Research current MCP information (2024-2025)
-        - Include specific tools, implementations, code examples
-        - Address controversies objectively
-        - Target 1500-2500 words
-        - Use markdown formatting appropriately"""
-
-        result = generate_structured_output(
-            writing_prompt,
-            ChapterContent,
-            use_search=True,
-            temperature=0.7
-        )
 
-        # Post-process to remove any preamble that slipped through
-        content = result.content
-        content = strip_preamble(content)
+def write_chapter_structured(
+    index: int,
+    prompt: dict,
+    context: SharedContext,
+    section_executor: ThreadPoolExecutor = None,
+    research: ResearchStage = None,
+) -> str:
+    """
+    Write and save a single chapter using structured output with search grounding.
 
-        chapters.append(content)
+    Args:
+        index: 1-based position of the chapter in the prompt list
+        prompt: Chapter prompt dict
+        context: Shared style guide and format rules
+                 (see build_structured_chapter_context)
+        section_executor: When given, draft the chapter outline-first with its
+                          sections written concurrently on this pool; context
+                          must then hold the by_section rules
+        research: Shared research stage; when given, the chapter's research
+                  notes are injected into its prompts and no search is used
 
-        # Save individual chapter (cleaned)
-        safe_title = chapter_title.lower().replace(" ", "-").replace("/", "-")
-        output_path = CHAPTERS_DIR / f"chapter-{chapter_num:02d}-{safe_title}.md"
+    Returns:
+        Cleaned chapter content
+    """
+    chapter_num = prompt.get("chapter_number", index)
+    chapter_title = prompt.get("title", f"Chapter {index}")
+
+    writing_prompt = f"""Write Chapter {chapter_num}: {chapter_title}.
+
+    CHAPTER BRIEF:
+    {json.dumps(prompt, indent=2)}
+
+    Start content with: ## {chapter_title}"""
+
+    # Chapters whose prompt lists no research topics fall back to search
+    notes = research.notes(prompt) if research is not None else []
+    research_notes = (research.digest(prompt) or None) if notes else None
+    use_search = research_notes is None
+    if research_notes:
+        writing_prompt += f"""
+
+    RESEARCH NOTES (current, from web search):
+    {research_notes}"""
+
+    safe_title = chapter_title.lower().replace(" ", "-").replace("/", "-")
+    output_path = CHAPTERS_DIR / f"chapter-{chapter_num:02d}-{safe_title}.md"
+    artifact = f"chapter-{chapter_num:02d}"
+    if section_executor is not None:
+        inputs = {
+            "context": context.text,
+            "outline_prompt": build_outline_prompt(prompt),
+            "mode": "sections",
+            "model": GEMINI_MODEL,
+            "outline_model": GEMINI_MODEL_FAST,
+            "research": research_notes,
+            "params": {"use_search": use_search},
+        }
+    else:
+        inputs = {
+            "context": context.text,
+            "prompt": writing_prompt,
+            "schema": ChapterContent.model_json_schema(),
+            "model": GEMINI_MODEL,
+            "params": {"temperature": 0.7, "use_search": use_search},
+        }
+    if is_built(artifact, inputs, [output_path]):
+        print(f"Chapter {chapter_num} up to date, reusing: {output_path}")
+        return output_path.read_text()
+
+    print(f"\n--- Writing Chapter {chapter_num}: {chapter_title} ---\n")
+
+    if section_executor is not None:
+        content, results = draft_chapter_by_section(
+            prompt, chapter_title, context, section_executor, research_notes
+        )
         output_path.write_text(content)
         print(f"Chapter saved to: {output_path}")
+        save_chapter_sources(chapter_num, results, notes)
+        mark_built(artifact, inputs, [output_path])
+        return content
+
+    chapter, result = generate_structured_result(
+        writing_prompt,
+        ChapterContent,
+        use_search=use_search,
+        temperature=0.7,
+        shared_context=context,
+    )
 
-        # Save sources if available
-        if result.sources:
-            sources_path = CHAPTERS_DIR / f"chapter-{chapter_num:02d}-sources.json"
-            sources_path.write_text(json.dumps(result.sources, indent=2))
+    # Post-process to remove any preamble that slipped through
+    content = chapter.content
+    content = strip_preamble(content)
 
-    return chapters
+    # Save individual chapter (cleaned)
+    output_path.write_text(content)
+    print(f"Chapter saved to: {output_path}")
 
+    # Sources come from the grounding metadata, not from the model's output
+    save_chapter_sources(chapter_num, [result], notes)
 
-def run_chapter_enhancement(chapters_dir: Path = None) -> list[str]:
-    """
-    Enhance existing chapters with more depth and technical detail.
+    mark_built(artifact, inputs, [output_path])
+    return content
 
-    Reads chapters from disk and expands them with:
-    - More technical depth and implementation details
-    - Additional code examples
-    - Deeper analysis of concepts
-    - Real-world case studies
-    """
-    print("\n" + "=" * 60)
-    print("PHASE 3.5: Enhancing Chapters (Adding Depth)")
-    print("=" * 60 + "\n")
 
-    if chapters_dir is None:
-        chapters_dir = CHAPTERS_DIR
-
-    # Find all chapter files
-    chapter_files = sorted(chapters_dir.glob("chapter-*.md"))
-    if not chapter_files:
-        raise ValueError(f"No chapter files found in {chapters_dir}")
-
-    # Filter out any sources files
-    chapter_files = [f for f in chapter_files if "sources" not in f.name]
+@telemetry.phase("chapters")
+def run_chapter_writing_structured(
+    chapter_prompts: Iterable[dict],
+    style_guide: str,
+    max_parallel_chapters: int = MAX_PARALLEL_CHAPTERS,
+    draft_by_section: bool = DRAFT_BY_SECTION,
+    research: ResearchStage = None,
+) -> list[str]:
+    """
+    Write chapters using Gemini structured output with search grounding.
 
-    print(f"Found {len(chapter_files)} chapters to enhance")
+    Chapters are generated concurrently on a bounded thread pool. Results are
+    returned in chapter_number order regardless of completion order.
 
-    enhanced_chapters = []
+    chapter_prompts may be a lazy iterable (e.g. fed by a streaming
+    curriculum analysis); each chapter is submitted as soon as its prompt
+    arrives.
 
-    for chapter_path in chapter_files:
-        original_content = chapter_path.read_text()
-        chapter_name = chapter_path.stem
+    Args:
+        chapter_prompts: Chapter prompt dicts from curriculum analysis
+        style_guide: Style guide text
+        max_parallel_chapters: Maximum concurrent chapter generations
+                               (1 = sequential)
+        draft_by_section: Outline each chapter with a fast model, then draft
+                          its sections concurrently (MAX_PARALLEL_SECTIONS
+                          across all chapters) instead of one long request
+        research: Shared research stage supplying each chapter's notes; chapter
+                  requests then run without Google Search
 
-        # Extract chapter number and title from content
-        lines = original_content.strip().split('\n')
-        title_line = next((l for l in lines if l.startswith('## ')), "## Unknown")
-        chapter_title = title_line.replace('## ', '').strip()
+    Returns:
+        Chapter contents ordered by chapter number
+    """
+    print("\n" + "=" * 60)
+    print("PHASE 3: Writing Chapters (Structured Output + Search)")
+    print("=" * 60 + "\n")
 
-        print(f"\n--- Enhancing: {chapter_title} ---")
-        print(f"    Original length: {len(original_content)} chars (~{len(original_content.split())} words)")
+    indexed_prompts = enumerate(chapter_prompts, 1)
+    if isinstance(chapter_prompts, list):
+        indexed_prompts = sorted(
+            indexed_prompts,
+            key=lambda item: item[1].get("chapter_number", item[0]),
+        )
 
-        enhancement_prompt = f"""You are enhancing a chapter from a technical book about MCP (Model Context Protocol).
+    # Style guide and format rules are uploaded once and referenced by every chapter
+    context = SharedContext(
+        build_structured_chapter_context(style_guide, by_section=draft_by_section),
+        display_name="chapter-writing",
+        use_search=research is None,
+    )
+    # One section pool shared by all chapters bounds total in-flight section drafts
+    section_executor = (
+        ThreadPoolExecutor(max_workers=MAX_PARALLEL_SECTIONS) if draft_by_section else None
+    )
 
-The current chapter is TOO SHALLOW and reads like a superficial blog post. Your task is to
+    with context, section_executor or nullcontext():
+        if max_parallel_chapters <= 1:
+            # Malformed JSON is retried like the parallel path's re-queue
+            written = [
+                (prompt.get("chapter_number", i), run_with_retry(
+                    write_chapter_structured, i, prompt, context, section_executor, research,
+                    policies=INVALID_OUTPUT_POLICIES, label=f"Chapter {i}",
+                ))
+                for i, prompt in indexed_prompts
+            ]
+        else:
+            print(f"Writing chapters with up to {max_parallel_chapters} in parallel")
+
+            with ThreadPoolExecutor(max_workers=max_parallel_chapters) as executor:
+                # Transport errors are retried inside the client; malformed JSON is
+                # re-queued here so the worker is free for other chapters meanwhile
+                futures = []
+                try:
+                    for i, prompt in indexed_prompts:
+                        futures.append((prompt.get("chapter_number", i), submit_with_retry(
+                            executor, write_chapter_structured, i, prompt, context, section_executor,
+                            research, policies=INVALID_OUTPUT_POLICIES, label=f"Chapter {i}",
+                        )))
+                    written = [(number, future.result()) for number, future in futures]
+                except BaseException:
+                    # A failure cancels chapters that have not started yet
+                    for _, future in futures:
+                        future.cancel()
+                    raise
+
+    return [content for _, content in sorted(written, key=lambda item: item[0])]
+
+
+# Shared enhancement instructions, identical for every chapter
+ENHANCEMENT_INSTRUCTIONS = """You are enhancing a chapter from a technical book about MCP (Model Context Protocol).
+
+The chapter is TOO SHALLOW and reads like a superficial blog post. Your task is to
 SIGNIFICANTLY EXPAND it with real technical depth.
 
-=== CURRENT CHAPTER (to enhance) ===
-{original_content}
-
 === ENHANCEMENT REQUIREMENTS ===
 
 1. **DOUBLE OR TRIPLE the length** - Target 4000-6000 words minimum
@@ -557,23 +1106,266 @@ Output the COMPLETE enhanced chapter in markdown, starting with the ## heading.
 Preserve the original structure but expand each section significantly.
 Do NOT summarize or truncate - output the FULL enhanced content."""
 
-        enhanced_content = generate_with_grounding(enhancement_prompt, use_search=True)
 
-        # Clean up any preamble
-        enhanced_content = strip_preamble(enhanced_content)
+# Section-level enhancement instructions; the full chapter follows as shared context
+SECTION_ENHANCEMENT_INSTRUCTIONS = """You are enhancing ONE SECTION of a chapter from a technical book about MCP
+(Model Context Protocol). Other sections of the same chapter are being expanded
+separately; the full chapter is given below for context only.
 
-        print(f"    Enhanced length: {len(enhanced_content)} chars (~{len(enhanced_content.split())} words)")
+=== ENHANCEMENT REQUIREMENTS ===
 
-        # Save enhanced chapter (overwrite or create new)
-        enhanced_path = chapters_dir / f"{chapter_name}-enhanced.md"
-        enhanced_path.write_text(enhanced_content)
-        print(f"    Saved to: {enhanced_path}")
+1. **Triple the length of the section** with real technical depth:
+   - How things work internally, design decisions, edge cases, failure modes
+   - Complete code examples, configuration snippets, API request/response examples
+   - Specific tools and versions (2024-2025), common pitfalls, trade-off analysis
+
+2. **Stay within the section**:
+   - Expand only the topic of the section you are given
+   - Do not repeat material that belongs to other sections in the outline
+   - Do not add a chapter introduction or conclusion
+
+3. **Maintain Book Quality**:
+   - Keep formal technical prose (no "we", "you", "let's")
+   - No greetings or preamble
+   - Proper markdown formatting; subsections use ####
+
+=== FORMAT ===
+Output ONLY the enhanced section in markdown, starting with its heading line
+exactly as given. Do NOT summarize or truncate."""
+
+
+def split_sections(content: str) -> list[str]:
+    """
+    Split a chapter at ### headings.
+
+    The first part is the lead (## heading and introduction); each further
+    part starts with its ### heading. Headings inside fenced code blocks are
+    ignored.
+    """
+    parts = []
+    current = []
+    in_fence = False
+    for line in content.strip().split('\n'):
+        if line.lstrip().startswith('```'):
+            in_fence = not in_fence
+        elif not in_fence and line.startswith('### ') and current:
+            parts.append('\n'.join(current).strip())
+            current = []
+        current.append(line)
+    parts.append('\n'.join(current).strip())
+    return [part for part in parts if part]
+
+
+def enhance_section(section: str, outline: str, context: SharedContext) -> str:
+    """
+    Expand a single chapter section.
+
+    Args:
+        section: Section markdown, starting with its heading
+        outline: Headings of every section in the chapter
+        context: Section enhancement instructions plus the full chapter
+                 (and research notes, in which case no search is used)
+
+    Returns:
+        Enhanced section, starting with the original heading
+    """
+    prompt = f"""=== CHAPTER OUTLINE ===
+{outline}
 
-        enhanced_chapters.append(enhanced_content)
+=== SECTION TO ENHANCE ===
+{section}"""
+
+    enhanced = generate_guarded(lambda extra: generate_with_grounding_result(
+        prompt + extra, use_search=context.use_search, shared_context=context,
+    )).text
+
+    # Drop anything the model put before the section heading
+    heading = section.split('\n', 1)[0].strip()
+    return align_to_heading(strip_preamble(enhanced), heading if heading.startswith('#') else None)
+
+
+def enhance_chapter_by_section(
+    chapter_name: str,
+    original_content: str,
+    sections: list[str],
+    executor: ThreadPoolExecutor,
+    research_notes: str = None,
+) -> str:
+    """
+    Enhance a chapter's sections concurrently and reassemble them in order.
+
+    Args:
+        chapter_name: Chapter file stem (used for the cached-content name)
+        original_content: Full original chapter, shared by every section request
+        sections: Output of split_sections
+        executor: Pool the section requests run on
+        research_notes: Cached research notes for the chapter; when given,
+                        sections are enhanced from them without search
+
+    Returns:
+        Enhanced chapter content
+    """
+    outline = '\n'.join(section.split('\n', 1)[0] for section in sections)
+    shared = f"""{SECTION_ENHANCEMENT_INSTRUCTIONS}
+
+=== FULL CHAPTER (context only) ===
+{original_content}"""
+    if research_notes:
+        shared += f"""
+
+=== RESEARCH NOTES (current, from web search) ===
+{research_notes}"""
+
+    with SharedContext(shared, display_name=f"enhance-{chapter_name}",
+                       use_search=research_notes is None) as context:
+        start = time.monotonic()
+        futures = [
+            executor.submit(contextvars.copy_context().run, enhance_section, section, outline, context)
+            for section in sections
+        ]
+        try:
+            enhanced_sections = [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        print(f"    {len(sections)} sections enhanced in {time.monotonic() - start:.1f}s")
+
+    return '\n\n'.join(enhanced_sections) + '\n'
+
+
+@telemetry.phase("enhancement")
+def run_chapter_enhancement(
+    chapters_dir: Path = None,
+    by_section: bool = ENHANCE_BY_SECTION,
+    max_parallel_sections: int = MAX_PARALLEL_SECTIONS,
+    use_research: bool = RESEARCH_BEFORE_WRITING,
+) -> list[str]:
+    """
+    Enhance existing chapters with more depth and technical detail.
+
+    Reads chapters from disk and expands them with:
+    - More technical depth and implementation details
+    - Additional code examples
+    - Deeper analysis of concepts
+    - Real-world case studies
+
+    Args:
+        chapters_dir: Directory holding chapter-*.md files
+        by_section: Split chapters at ### headings and expand the sections
+                    concurrently; chapters without sections are enhanced whole
+        max_parallel_sections: Concurrent section requests
+        use_research: Take each chapter's research notes from the research
+                      cache (re-grounding only stale topics) and enhance
+                      without search; needs chapter-prompts.json
+
+    Returns:
+        Enhanced chapter contents, in file order
+    """
+    print("\n" + "=" * 60)
+    print("PHASE 3.5: Enhancing Chapters (Adding Depth)")
+    print("=" * 60 + "\n")
+
+    if chapters_dir is None:
+        chapters_dir = CHAPTERS_DIR
+
+    # Find all chapter files
+    chapter_files = sorted(chapters_dir.glob("chapter-*.md"))
+    if not chapter_files:
+        raise ValueError(f"No chapter files found in {chapters_dir}")
+
+    # Filter out sources files and earlier enhancement outputs
+    chapter_files = [f for f in chapter_files if "sources" not in f.name and "enhanced" not in f.name]
+
+    print(f"Found {len(chapter_files)} chapters to enhance")
+
+    # Research topics come from the chapter prompts, matched by chapter number
+    prompts_path = CHAPTER_PROMPTS_DIR / "chapter-prompts.json"
+    prompts_by_number = {}
+    if use_research and prompts_path.exists():
+        prompts_by_number = {p["chapter_number"]: p for p in json.loads(prompts_path.read_text())}
+    research = ResearchStage(output_path=None) if prompts_by_number else None
+
+    enhanced_chapters = []
+
+    # The shared instructions (~400 tokens) are far below the context-caching
+    # minimum, so whole-chapter requests send them inline; section requests
+    # share a per-chapter context that includes the full chapter instead
+    with ThreadPoolExecutor(max_workers=max_parallel_sections) as executor, \
+            research or nullcontext():
+        for chapter_prompt in prompts_by_number.values():
+            research.submit(chapter_prompt)
+
+        for chapter_path in chapter_files:
+            original_content = chapter_path.read_text()
+            chapter_name = chapter_path.stem
+
+            match = re.match(r'chapter-(\d+)', chapter_name)
+            chapter_prompt = prompts_by_number.get(int(match.group(1))) if match else None
+            research_notes = (research.digest(chapter_prompt) or None) if chapter_prompt else None
+
+            # Extract chapter number and title from content
+            lines = original_content.strip().split('\n')
+            title_line = next((l for l in lines if l.startswith('## ')), "## Unknown")
+            chapter_title = title_line.replace('## ', '').strip()
+
+            sections = split_sections(original_content) if by_section else []
+            by_section_here = len(sections) > 1
+
+            enhancement_prompt = f"""{ENHANCEMENT_INSTRUCTIONS}
+
+=== CURRENT CHAPTER (to enhance) ===
+{original_content}"""
+            if research_notes:
+                enhancement_prompt += f"""
+
+=== RESEARCH NOTES (current, from web search) ===
+{research_notes}"""
+
+            enhanced_path = chapters_dir / f"{chapter_name}-enhanced.md"
+            artifact = f"{chapter_name}-enhanced"
+            inputs = {
+                "chapter": original_content,
+                "instructions": SECTION_ENHANCEMENT_INSTRUCTIONS if by_section_here else ENHANCEMENT_INSTRUCTIONS,
+                "mode": "sections" if by_section_here else "chapter",
+                "research": research_notes,
+                "model": GEMINI_MODEL,
+                "params": {"use_search": research_notes is None},
+            }
+            if is_built(artifact, inputs, [enhanced_path]):
+                print(f"\n--- {chapter_title} up to date, reusing: {enhanced_path} ---")
+                enhanced_chapters.append(enhanced_path.read_text())
+                continue
+
+            print(f"\n--- Enhancing: {chapter_title} ---")
+            print(f"    Original length: {len(original_content)} chars (~{len(original_content.split())} words)")
+
+            if by_section_here:
+                enhanced_content = enhance_chapter_by_section(
+                    chapter_name, original_content, sections, executor, research_notes
+                )
+                enhanced_path.write_text(enhanced_content)
+            else:
+                # Stream the enhanced chapter to disk, cleaning up any preamble at the end
+                enhanced_content = write_guarded_stream(
+                    lambda extra: generate_with_grounding_stream(
+                        enhancement_prompt + extra,
+                        use_search=research_notes is None,
+                    ),
+                    enhanced_path,
+                    postprocess=strip_preamble,
+                )
+
+            print(f"    Enhanced length: {len(enhanced_content)} chars (~{len(enhanced_content.split())} words)")
+            print(f"    Saved to: {enhanced_path}")
+            mark_built(artifact, inputs, [enhanced_path])
+
+            enhanced_chapters.append(enhanced_content)
 
     return enhanced_chapters
 
 
+@telemetry.phase("stitching")
 def run_simple_stitch(chapters: list[str] = None, chapters_dir: Path = None, use_enhanced: bool = True) -> str:
     """
     Simple concatenation of chapters - NO LLM processing.
@@ -661,7 +1453,13 @@ def run_stitching_direct(chapters: list[str], style_guide: str) -> str:
     return run_simple_stitch(chapters=chapters, use_enhanced=False)
 
 
-def run_full_pipeline(use_direct_gemini: bool = True, use_structured: bool = True) -> str:
+def run_full_pipeline(
+    use_direct_gemini: bool = True,
+    use_structured: bool = True,
+    max_parallel_chapters: int = MAX_PARALLEL_CHAPTERS,
+    draft_by_section: bool = DRAFT_BY_SECTION,
+    research_first: bool = RESEARCH_BEFORE_WRITING,
+) -> str:
     """
     Run the complete pipeline from curriculum to final document.
 
@@ -670,6 +1468,10 @@ def run_full_pipeline(use_direct_gemini: bool = True, use_structured: bool = Tru
                           If False, use CrewAI agents (less search integration).
         use_structured: If True, use Gemini structured outputs (recommended).
                        If False, use free-form text generation.
+        max_parallel_chapters: Concurrent chapter generations in structured mode.
+        draft_by_section: Outline-first section drafting in structured mode.
+        research_first: In structured mode, research each unique topic once
+                        up front and write chapters from the notes without search.
 
     Returns:
         Path to the final document.
@@ -677,25 +1479,83 @@ def run_full_pipeline(use_direct_gemini: bool = True, use_structured: bool = Tru
     # Load curriculum
     curriculum = load_curriculum()
     print(f"Loaded curriculum: {len(curriculum)} characters")
+    research = None
+
+    # Style guide and curriculum analysis share no inputs, so they run concurrently;
+    # chapter writing waits for the style guide (and, outside structured mode,
+    # for the full analysis), stitching for the chapters
+    graph = TaskGraph()
 
     if use_structured:
-        # Use structured outputs (cleaner, no preamble)
-        style_guide = run_style_guide_structured(curriculum)
-        chapter_prompts = run_curriculum_analysis_structured(curriculum)
-        chapters = run_chapter_writing_structured(chapter_prompts, style_guide)
-        final_document = run_stitching_direct(chapters, style_guide)
+        # Use structured outputs (cleaner, no preamble). Curriculum analysis
+        # streams each chapter prompt into a queue as soon as it is parsed, so
+        # chapter writing starts (once the style guide exists) before the
+        # analysis has finished
+        prompt_queue = queue.Queue()
+
+        # Research starts for each prompt's topics as soon as the prompt is parsed
+        research = ResearchStage() if research_first else None
+
+        def on_prompt(chapter_prompt):
+            if research is not None:
+                research.submit(chapter_prompt)
+            prompt_queue.put(chapter_prompt)
+
+        def analyse_curriculum():
+            try:
+                return run_curriculum_analysis_structured(curriculum, on_prompt=on_prompt)
+            finally:
+                prompt_queue.put(None)
+
+        def streamed_prompts():
+            while (chapter_prompt := prompt_queue.get()) is not None:
+                yield chapter_prompt
+
+        graph.add("style_guide", lambda: run_style_guide_structured(curriculum))
+        graph.add("chapter_prompts", analyse_curriculum)
+        graph.add(
+            "chapters",
+            lambda style_guide: run_chapter_writing_structured(
+                streamed_prompts(), style_guide,
+                max_parallel_chapters=max_parallel_chapters,
+                draft_by_section=draft_by_section,
+                research=research,
+            ),
+            deps=("style_guide",),
+        )
+        # Depends on chapter_prompts too, so a failed analysis never stitches a partial book
+        graph.add(
+            "final_document",
+            lambda chapters, style_guide, chapter_prompts: run_stitching_direct(chapters, style_guide),
+            deps=("chapters", "style_guide", "chapter_prompts"),
+        )
     else:
         # Original CrewAI-based pipeline
-        style_guide = run_style_guide_generation(curriculum)
-        chapter_prompts = run_curriculum_analysis(curriculum)
-        print(f"\nGenerated {len(chapter_prompts)} chapter prompts")
-
-        if use_direct_gemini:
-            chapters = run_chapter_writing_with_research(chapter_prompts, style_guide)
-        else:
-            chapters = run_chapter_writing_crew(chapter_prompts, style_guide)
+        def write_chapters(style_guide, chapter_prompts):
+            print(f"\nGenerated {len(chapter_prompts)} chapter prompts")
+            if use_direct_gemini:
+                return run_chapter_writing_with_research(chapter_prompts, style_guide)
+            return run_chapter_writing_crew(chapter_prompts, style_guide)
+
+        graph.add("style_guide", lambda: run_style_guide_generation(curriculum))
+        graph.add("chapter_prompts", lambda: run_curriculum_analysis(curriculum))
+        graph.add("chapters", write_chapters, deps=("style_guide", "chapter_prompts"))
+        graph.add(
+            "final_document",
+            lambda chapters, style_guide: run_document_stitching(chapters, style_guide),
+            deps=("chapters", "style_guide"),
+        )
 
-        final_document = run_document_stitching(chapters, style_guide)
+    if research is not None:
+        with research:
+            graph.run()
+        stats = research.stats()
+        cache_stats = get_research_cache().stats()
+        print(f"Research: {stats['unique']} unique topics for {stats['requested']} chapter "
+              f"topic requests ({cache_stats['hits']} fresh in cache, "
+              f"{cache_stats['misses']} grounded)")
+    else:
+        graph.run()
 
     print("\n" + "=" * 60)
     print("PIPELINE COMPLETE")
@@ -706,4 +1566,16 @@ def run_full_pipeline(use_direct_gemini: bool = True, use_structured: bool = Tru
     print(f"  - Individual Chapters: {CHAPTERS_DIR}/")
     print(f"  - Final Document: {FULL_TEXT_DIR / 'mcp-crash-course.md'}")
 
+    print("\nPhase timings:")
+    graph.print_timings()
+    telemetry.record_graph("book", graph.timings())
+
+    stats = get_connection_stats()
+    print(f"\nGemini HTTP: {stats['requests']} requests, "
+          f"{stats['reused_connections']} on reused connections "
+          f"({stats['new_connections']} opened)")
+    cache_stats = get_cache_stats()
+    print(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+          f"({cache_stats['entries']} entries, {cache_stats['bytes'] / 1e6:.1f} MB)")
+
     return str(FULL_TEXT_DIR / "mcp-crash-course.md")
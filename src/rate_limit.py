@@ -0,0 +1,170 @@
+"""Adaptive token-bucket rate limiting shared by all API call sites."""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from src.config import (
+    GEMINI_RPM,
+    GEMINI_TPM,
+    REPLICATE_RPM,
+    RATE_LIMIT_DEFAULT_BACKOFF,
+)
+
+# Floor for the adaptive rate multiplier after repeated throttling
+MIN_RATE_SCALE = 0.1
+
+
+class TokenBucketLimiter:
+    """
+    Per-provider limiter with a requests-per-minute and optional tokens-per-minute budget.
+
+    Both budgets are token buckets holding up to one minute of capacity, so
+    idle time turns into burst headroom. On a 429 the refill rate is halved
+    and all callers pause for the Retry-After interval; each success then
+    restores the rate additively (AIMD), so parallel phases converge on the
+    real quota instead of a hard-coded sleep.
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: Optional[float] = None):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rate_scale = 1.0
+        self.throttled = 0
+        self._requests = float(rpm)
+        self._tokens = float(tpm) if tpm else 0.0
+        self._blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60 * self.rate_scale)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60 * self.rate_scale)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take capacity if available; otherwise return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            tokens = min(tokens, self.tpm) if self.tpm else 0
+            request_wait = (1 - self._requests) * 60 / (self.rpm * self.rate_scale)
+            token_wait = (tokens - self._tokens) * 60 / (self.tpm * self.rate_scale) if self.tpm else 0.0
+            wait = max(request_wait, token_wait)
+            if wait <= 0:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        """Block until one request (and `tokens` tokens) fit in the budget."""
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0):
+        """Async counterpart of acquire; yields to the event loop while waiting."""
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """Back off after a 429: pause everyone and halve the refill rate."""
+        with self._lock:
+            now = time.monotonic()
+            pause = retry_after if retry_after is not None else RATE_LIMIT_DEFAULT_BACKOFF
+            self._blocked_until = max(self._blocked_until, now + pause)
+            self._requests = min(self._requests, 0.0)
+            self.rate_scale = max(MIN_RATE_SCALE, self.rate_scale / 2)
+            self.throttled += 1
+        print(f"  Rate limited by {self.name}; pausing {pause:.1f}s "
+              f"(rate now {self.rate_scale:.0%} of budget)")
+
+    def record_success(self):
+        """Recover the refill rate gradually after successful calls."""
+        if self.rate_scale < 1.0:
+            with self._lock:
+                self.rate_scale = min(1.0, self.rate_scale + 0.05)
+
+
+_limiters: dict[str, TokenBucketLimiter] = {}
+_limiters_lock = threading.Lock()
+
+# Budgets per provider: (requests per minute, tokens per minute)
+PROVIDER_BUDGETS = {
+    "gemini": (GEMINI_RPM, GEMINI_TPM),
+    "replicate": (REPLICATE_RPM, None),
+}
+
+
+def get_limiter(provider: str) -> TokenBucketLimiter:
+    """Get the process-wide limiter for a provider ("gemini" or "replicate")."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            rpm, tpm = PROVIDER_BUDGETS[provider]
+            _limiters[provider] = TokenBucketLimiter(provider, rpm, tpm)
+        return _limiters[provider]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough input token estimate (~4 characters per token)."""
+    return len(text) // 4
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Whether an SDK exception is an HTTP 429 (Gemini APIError or ReplicateError)."""
+    return getattr(exc, "code", None) == 429 or getattr(exc, "status", None) == 429
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Read the Retry-After header from an SDK exception's HTTP response, if present."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def rate_limited(provider: str, tokens: int = 0):
+    """
+    Wrap one API call: wait for budget, then feed the outcome back to the limiter.
+
+    Usage:
+        with rate_limited("gemini", tokens=estimate_tokens(prompt)):
+            response = client.models.generate_content(...)
+    """
+    limiter = get_limiter(provider)
+    limiter.acquire(tokens)
+    try:
+        yield limiter
+    except Exception as e:
+        if is_rate_limit_error(e):
+            limiter.record_throttle(retry_after_seconds(e))
+        raise
+    limiter.record_success()
+
+
+@asynccontextmanager
+async def arate_limited(provider: str, tokens: int = 0):
+    """Async counterpart of rate_limited."""
+    limiter = get_limiter(provider)
+    await limiter.aacquire(tokens)
+    try:
+        yield limiter
+    except Exception as e:
+        if is_rate_limit_error(e):
+            limiter.record_throttle(retry_after_seconds(e))
+        raise
+    limiter.record_success()
@@ -0,0 +1,389 @@
+"""Replicate client wrapper shared by the image and TTS call sites."""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+import replicate
+import requests
+from replicate.exceptions import ModelError
+from replicate.prediction import Prediction
+
+from src.config import (
+    REPLICATE_MAX_IN_FLIGHT,
+    REPLICATE_POLL_INTERVAL,
+    REPLICATE_FILES_CACHE,
+    REPLICATE_FILE_TTL,
+)
+from src.rate_limit import rate_limited, arate_limited
+from src.resilience import CircuitOpenError, call_with_retry, acall_with_retry
+from src.telemetry import record_replicate_call
+
+
+def _create_prediction(model: str, input: dict) -> Prediction:
+    """Start a prediction for "owner/name" or "owner/name:version"."""
+    with rate_limited("replicate"):
+        if ":" in model:
+            return replicate.predictions.create(version=model.split(":", 1)[1], input=input)
+        return replicate.models.predictions.create(model=model, input=input)
+
+
+def _queue_time(prediction: Prediction) -> Optional[float]:
+    """Seconds the prediction waited between creation and start."""
+    if not prediction.created_at or not prediction.started_at:
+        return None
+    created = datetime.fromisoformat(prediction.created_at.replace("Z", "+00:00"))
+    started = datetime.fromisoformat(prediction.started_at.replace("Z", "+00:00"))
+    return (started - created).total_seconds()
+
+
+def record_prediction(model: str, prediction: Prediction, wall_time: float):
+    """Record a finished prediction's timings in the run telemetry."""
+    metrics = prediction.metrics or {}
+    record_replicate_call(
+        model,
+        wall_time=wall_time,
+        predict_time=metrics.get("predict_time"),
+        queue_time=_queue_time(prediction),
+    )
+
+
+def _run(model: str, input: dict) -> Any:
+    start = time.monotonic()
+    prediction = _create_prediction(model, input)
+    prediction.wait()
+    record_prediction(model, prediction, time.monotonic() - start)
+
+    if prediction.status != "succeeded":
+        raise ModelError(prediction)
+    return prediction.output
+
+
+def run_model(model: str, input: dict) -> Any:
+    """
+    Run a Replicate model and wait for its output.
+
+    Transient failures are retried with backoff behind the Replicate
+    circuit breaker (see src.resilience). Prediction and queue times are
+    recorded in the run telemetry.
+
+    Args:
+        model: Model reference (e.g. "resemble-ai/chatterbox")
+        input: Model input parameters
+
+    Returns:
+        The prediction output (typically a URL to the generated file)
+    """
+    return call_with_retry("replicate", _run, model, input)
+
+
+def _download(url: str, output_path: Path) -> Path:
+    response = requests.get(url, stream=True, timeout=120)
+    response.raise_for_status()
+
+    # Callers reuse any output file that exists, so only a complete download
+    # may appear under output_path
+    partial_path = output_path.with_name(output_path.name + ".partial")
+    try:
+        with open(partial_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+        os.replace(partial_path, output_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+
+    return output_path
+
+
+def download_output(output: Any, output_path: Path) -> Path:
+    """
+    Download a model output (URL string or FileOutput) to a local file, with retries.
+
+    Args:
+        output: Output returned by run_model
+        output_path: Destination file
+
+    Returns:
+        output_path
+    """
+    if isinstance(output, list):
+        output = output[0]
+    url = getattr(output, "url", output)
+    return call_with_retry("replicate", _download, str(url), output_path)
+
+
+_uploads_lock = threading.Lock()
+
+
+def _load_uploads() -> dict:
+    try:
+        return json.loads(REPLICATE_FILES_CACHE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _upload(path: Path):
+    with rate_limited("replicate"):
+        return replicate.files.create(path)
+
+
+def upload_file(path: Path) -> str:
+    """
+    Upload a local input file to Replicate once and return its URL.
+
+    Uploads are cached across runs by SHA-256 of the file content, so
+    repeated runs (and every prediction within a run) pass the same file
+    by reference instead of re-sending its bytes. A cached upload is
+    reused for REPLICATE_FILE_TTL, or until Replicate's own expiry if that
+    is sooner.
+
+    Args:
+        path: Local file (e.g. a voice reference recording)
+
+    Returns:
+        URL to pass as a model input
+    """
+    path = Path(path)
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+
+    with _uploads_lock:
+        uploads = _load_uploads()
+        cached = uploads.get(digest)
+        if cached is not None and cached["expires_at"] > time.time():
+            return cached["url"]
+
+        uploaded = call_with_retry("replicate", _upload, path)
+        expires_at = time.time() + REPLICATE_FILE_TTL
+        replicate_expiry = _parse_time(uploaded.expires_at)
+        if replicate_expiry is not None:
+            # Stop reusing it an hour before Replicate deletes it
+            expires_at = min(expires_at, replicate_expiry - 3600)
+
+        # Drop expired entries while rewriting the cache
+        uploads = {key: entry for key, entry in uploads.items() if entry["expires_at"] > time.time()}
+        uploads[digest] = {
+            "name": path.name,
+            "id": uploaded.id,
+            "url": uploaded.urls["get"],
+            "expires_at": expires_at,
+        }
+        REPLICATE_FILES_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = REPLICATE_FILES_CACHE.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(uploads, indent=2))
+        os.replace(tmp_path, REPLICATE_FILES_CACHE)
+
+    print(f"Uploaded {path.name} to Replicate ({path.stat().st_size / 1024:.0f} KB), "
+          f"reusable until {datetime.fromtimestamp(expires_at).isoformat(timespec='minutes')}")
+    return uploads[digest]["url"]
+
+
+# Prediction states after which Replicate will not change the prediction
+TERMINAL_STATUSES = {"succeeded", "failed", "canceled"}
+
+
+class PredictionManager:
+    """
+    Runs many Replicate predictions from one background event loop.
+
+    submit() returns immediately with a Future. Predictions are created as
+    soon as a slot is free (at most max_in_flight exist at once), a single
+    poller refreshes every in-flight prediction each poll_interval, and each
+    output is downloaded as soon as its prediction succeeds, while the
+    others keep running. No thread is held for a prediction's runtime.
+
+    Creation and every status poll go through the Replicate rate limiter
+    and retry policy (see src.resilience), so with many predictions in
+    flight a sweep simply takes longer. A prediction that fails on
+    Replicate is retried like run_model does; a poll that fails is retried
+    on the next sweep, never by creating a new prediction. Predictions
+    still running when the manager is closed on an error are cancelled on
+    Replicate before the loop stops. Telemetry is recorded in the
+    submitter's phase.
+
+    Usage:
+        with PredictionManager(max_in_flight=32) as predictions:
+            futures = [predictions.submit(model, input, path) for ...]
+            for future in futures:
+                future.result()
+    """
+
+    def __init__(self, max_in_flight: int = REPLICATE_MAX_IN_FLIGHT,
+                 poll_interval: float = REPLICATE_POLL_INTERVAL):
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._waiting: dict[str, tuple[Prediction, asyncio.Future]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._cancels: set[asyncio.Task] = set()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="replicate-predictions", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "PredictionManager":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
+
+    @property
+    def in_flight(self) -> int:
+        """Predictions currently running on Replicate."""
+        return len(self._waiting)
+
+    def submit(self, model: str, input: dict, output_path: Optional[Path] = None) -> Future:
+        """
+        Queue a prediction.
+
+        Args:
+            model: Model reference (e.g. "resemble-ai/chatterbox")
+            input: Model input parameters
+            output_path: Download the output here once the prediction succeeds
+
+        Returns:
+            Future resolving to output_path when given, otherwise to the
+            prediction output
+        """
+        future: Future = Future()
+        context = contextvars.copy_context()
+
+        def start():
+            if not future.set_running_or_notify_cancel():
+                return
+            task = self._loop.create_task(self._job(model, input, output_path), context=context)
+            self._tasks.add(task)
+            task.add_done_callback(lambda t: self._finish(t, future))
+            future.add_done_callback(
+                lambda f: f.cancelled() and self._loop.call_soon_threadsafe(task.cancel)
+            )
+
+        self._loop.call_soon_threadsafe(start)
+        return future
+
+    def _finish(self, task: asyncio.Task, future: Future):
+        self._tasks.discard(task)
+        if future.done():
+            return
+        if task.cancelled():
+            # A running Future cannot be cancel()ed; report it the same way
+            future.set_exception(CancelledError())
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    async def _job(self, model: str, input: dict, output_path: Optional[Path]) -> Any:
+        output = await acall_with_retry("replicate", self._predict, model, input)
+        if output_path is None:
+            return output
+        # Downloads run off the loop; the prediction's slot is already free
+        return await asyncio.to_thread(download_output, output, output_path)
+
+    async def _predict(self, model: str, input: dict) -> Any:
+        async with self._slots:
+            start = time.monotonic()
+            async with arate_limited("replicate"):
+                if ":" in model:
+                    prediction = await replicate.predictions.async_create(
+                        version=model.split(":", 1)[1], input=input
+                    )
+                else:
+                    prediction = await replicate.models.predictions.async_create(
+                        model=model, input=input
+                    )
+            try:
+                prediction = await self._wait(prediction)
+            except asyncio.CancelledError:
+                # Stop billing for it; close() waits for these before stopping the loop
+                self._cancels.add(self._loop.create_task(self._cancel(prediction)))
+                raise
+            record_prediction(model, prediction, time.monotonic() - start)
+
+        if prediction.status != "succeeded":
+            raise ModelError(prediction)
+        return prediction.output
+
+    async def _cancel(self, prediction: Prediction):
+        try:
+            async with arate_limited("replicate"):
+                await prediction.async_cancel()
+        except Exception as e:
+            print(f"  Could not cancel Replicate prediction {prediction.id}: {e}")
+
+    async def _reload(self, prediction: Prediction):
+        async with arate_limited("replicate"):
+            await prediction.async_reload()
+
+    def _wait(self, prediction: Prediction) -> asyncio.Future:
+        done = self._loop.create_future()
+        self._waiting[prediction.id] = (prediction, done)
+        if self._poller is None or self._poller.done():
+            self._poller = self._loop.create_task(self._poll())
+        return done
+
+    async def _poll(self):
+        """Refresh every in-flight prediction once per sweep until none are left."""
+        while self._waiting:
+            await asyncio.sleep(self.poll_interval)
+            waiting = list(self._waiting.items())
+            results = await asyncio.gather(
+                *(acall_with_retry("replicate", self._reload, prediction)
+                  for _, (prediction, _) in waiting),
+                return_exceptions=True,
+            )
+            for (prediction_id, (prediction, done)), result in zip(waiting, results):
+                if done.done():  # Waiter was cancelled
+                    del self._waiting[prediction_id]
+                elif isinstance(result, Exception):
+                    # The prediction is still running (and billed); failing the
+                    # waiter would make the retry create a duplicate
+                    if not isinstance(result, CircuitOpenError):
+                        print(f"  Polling prediction {prediction_id} failed ({result}); "
+                              f"retrying next sweep")
+                elif prediction.status in TERMINAL_STATUSES:
+                    del self._waiting[prediction_id]
+                    done.set_result(prediction)
+
+    def close(self, cancel: bool = False):
+        """
+        Wait for outstanding predictions (or cancel them) and stop the loop.
+
+        Args:
+            cancel: Cancel queued and running predictions instead of waiting
+        """
+        async def drain():
+            # Let start() callbacks already scheduled by submit() run first
+            await asyncio.sleep(0)
+            tasks = list(self._tasks)
+            if cancel:
+                for task in tasks:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._cancels:
+                await asyncio.shield(asyncio.gather(*self._cancels, return_exceptions=True))
+            if self._poller is not None:
+                self._poller.cancel()
+                await asyncio.gather(self._poller, return_exceptions=True)
+
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(drain(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
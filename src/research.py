@@ -0,0 +1,217 @@
+"""Shared research stage: each unique topic is researched once for the whole book."""
+
+import contextvars
+import json
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from src.config import MAX_PARALLEL_RESEARCH, RESEARCH_DIR
+from src.gemini_client import generate_structured_grounded
+from src import telemetry
+from src.research_cache import get_research_cache
+from src.resilience import INVALID_OUTPUT_POLICIES, run_with_retry
+from src.schemas import ResearchNote
+
+# Words ignored when deciding whether two topics are the same
+TOPIC_STOPWORDS = {
+    "a", "an", "and", "the", "of", "for", "in", "on", "to", "with", "vs", "versus",
+    "mcp", "model", "context", "protocol",
+}
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    Reduce a research topic to a key shared by its rephrasings.
+
+    Lowercases, drops punctuation and filler words (including "MCP", which
+    every topic is about), and sorts the remaining words, so "Security risks
+    in MCP" and "MCP security risks" map to the same key.
+    """
+    words = re.sub(r"[^a-z0-9.+#-]+", " ", topic.lower()).split()
+    key_words = sorted({w.strip(".-") for w in words} - TOPIC_STOPWORDS - {""})
+    return " ".join(key_words) or topic.strip().lower()
+
+
+def build_research_prompt(topic: str) -> str:
+    """Build the grounded research request for one topic."""
+    return f"""Research this topic for a printed technical book about MCP (Model Context Protocol),
+using live web search for current (2024-2025) information.
+
+TOPIC: {topic}
+
+Write concise, factual research notes (150-300 words) as markdown bullets:
+- Current state and recent developments, with dates
+- Specific tools, implementations, vendors and version numbers
+- Concrete figures, limits and configuration details
+- Open debates or disagreements between sources
+
+Notes only: no introduction, no conclusions."""
+
+
+@telemetry.attribute("research")
+def research_topic(topic: str) -> dict:
+    """
+    Research one topic, consulting the persistent research cache first.
+
+    Fresh cached notes are returned without an API call. Otherwise the topic
+    is grounded with Google Search and the summary and grounding-metadata
+    sources are stored; if that fails, stale notes are used when available.
+
+    Returns:
+        {"topic", "summary", "sources", "fetched_at"}, with sources as
+        {"title", "uri"} dicts
+    """
+    key = normalize_topic(topic)
+    cache = get_research_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        # The research cache owns freshness, so bypass the response cache;
+        # malformed notes are requested again rather than failing every chapter
+        note, sources = run_with_retry(
+            lambda: generate_structured_grounded(
+                build_research_prompt(topic), ResearchNote, use_cache=False
+            ),
+            policies=INVALID_OUTPUT_POLICIES, label=f"Research on '{topic}'",
+        )
+    except Exception as e:
+        stale = cache.get(key, allow_stale=True)
+        if stale is None:
+            raise
+        fetched = datetime.fromtimestamp(stale["fetched_at"]).isoformat(timespec="minutes")
+        print(f"  Re-grounding '{topic}' failed ({e}); using notes fetched {fetched}")
+        return stale
+
+    cache.put(key, topic, note.notes, sources)
+    return cache.get(key, allow_stale=True)
+
+
+class ResearchStage:
+    """
+    Deduplicated, parallel research across every chapter prompt.
+
+    submit() registers a chapter's research_topics as prompts become
+    available (e.g. while curriculum analysis is still streaming); each
+    normalized topic is researched once, however many chapters list it,
+    and only when the research cache has no fresh notes for it.
+    digest() waits for a chapter's topics and returns the notes to inject
+    into its prompt, so chapter writing itself needs no search.
+
+    The "research" phase is timed once, from the first topic submitted to
+    the last one finished, since topics run concurrently with each other
+    and with chapter writing.
+
+    Usage:
+        with ResearchStage() as research:
+            research.submit(chapter_prompt)
+            ...
+            notes = research.digest(chapter_prompt)
+    """
+
+    def __init__(self, max_parallel: int = MAX_PARALLEL_RESEARCH,
+                 output_path: Optional[Path] = RESEARCH_DIR / "research-notes.json"):
+        self.output_path = output_path
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel)
+        self._lock = threading.Lock()
+        self._futures: dict[str, Future] = {}
+        self._chapters: dict[str, list[int]] = {}
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def __enter__(self) -> "ResearchStage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            for future in self._futures.values():
+                future.cancel()
+        self._executor.shutdown(wait=True)
+        if self._started is not None and self._finished is not None:
+            telemetry.record_phase_time("research", self._finished - self._started)
+        if exc_type is None and self.output_path is not None:
+            self.save()
+
+    def submit(self, chapter_prompt: dict):
+        """Start research for any of the chapter's topics not already under way."""
+        chapter_num = chapter_prompt.get("chapter_number")
+        with self._lock:
+            for topic in chapter_prompt.get("research_topics", []):
+                key = normalize_topic(topic)
+                self._chapters.setdefault(key, [])
+                if chapter_num not in self._chapters[key]:
+                    self._chapters[key].append(chapter_num)
+                if key not in self._futures:
+                    if self._started is None:
+                        self._started = time.monotonic()
+                    future = self._executor.submit(
+                        contextvars.copy_context().run, research_topic, topic
+                    )
+                    future.add_done_callback(self._mark_finished)
+                    self._futures[key] = future
+
+    def _mark_finished(self, future: Future):
+        # May run under self._lock (if the future is already done), so no locking
+        self._finished = time.monotonic()
+
+    def notes(self, chapter_prompt: dict) -> list[dict]:
+        """
+        Research notes for one chapter's topics (see research_topic).
+
+        Blocks until every topic the chapter lists has been researched. A
+        topic whose research failed is forgotten, so the next call (e.g. a
+        re-queued chapter) researches it again.
+        """
+        self.submit(chapter_prompt)
+        keys = dict.fromkeys(normalize_topic(t) for t in chapter_prompt.get("research_topics", []))
+        with self._lock:
+            futures = {key: self._futures[key] for key in keys}
+
+        notes = []
+        for key, future in futures.items():
+            try:
+                notes.append(future.result())
+            except Exception:
+                with self._lock:
+                    if self._futures.get(key) is future:
+                        del self._futures[key]
+                raise
+        return notes
+
+    def digest(self, chapter_prompt: dict) -> str:
+        """Research notes for one chapter, as markdown (blocks like notes())."""
+        parts = []
+        for note in self.notes(chapter_prompt):
+            sources = "\n".join(f"- {source['title']}: {source['uri']}" for source in note["sources"])
+            parts.append(f"TOPIC: {note['topic']}\n{note['summary']}"
+                         + (f"\n\nSources:\n{sources}" if sources else ""))
+        return "\n\n".join(parts)
+
+    def stats(self) -> dict:
+        """Topics requested across chapters versus unique topics researched."""
+        with self._lock:
+            return {
+                "requested": sum(len(chapters) for chapters in self._chapters.values()),
+                "unique": len(self._futures),
+            }
+
+    def save(self):
+        """Write every completed note, with the chapters that use it, to disk."""
+        with self._lock:
+            items = list(self._futures.items())
+            chapters = dict(self._chapters)
+        notes = [
+            {**future.result(), "key": key, "chapters": chapters.get(key, [])}
+            for key, future in items
+            if future.done() and not future.cancelled() and future.exception() is None
+        ]
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_path.write_text(json.dumps(notes, indent=2))
+        print(f"Research notes saved to: {self.output_path} "
+              f"({len(notes)} unique topics for {self.stats()['requested']} chapter requests)")
@@ -0,0 +1,104 @@
+"""Persistent cache of grounded research notes, keyed by normalized topic."""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.config import RESEARCH_CACHE_FILE, RESEARCH_CACHE_TTL
+
+
+class ResearchCache:
+    """
+    SQLite-backed store of research notes with a freshness TTL.
+
+    Each entry holds the grounded summary for one normalized topic, the web
+    sources from the response's grounding metadata and the time it was
+    fetched. Entries older than ttl are reported as stale rather than
+    deleted, so a failed re-ground can still fall back to them.
+    """
+
+    def __init__(self, path: Path = RESEARCH_CACHE_FILE, ttl: float = RESEARCH_CACHE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS research (
+                    key TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    sources TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )"""
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[dict]:
+        """
+        Look up the notes for a normalized topic.
+
+        Args:
+            key: Normalized topic (see research.normalize_topic)
+            allow_stale: Return entries older than the TTL too
+
+        Returns:
+            {"topic", "summary", "sources", "fetched_at"}, or None when
+            missing or stale
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT topic, summary, sources, fetched_at FROM research WHERE key = ?", (key,)
+            ).fetchone()
+            fresh = row is not None and time.time() - row[3] <= self.ttl
+            if not allow_stale:
+                if fresh:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        if row is None or not (fresh or allow_stale):
+            return None
+        return {"topic": row[0], "summary": row[1], "sources": json.loads(row[2]), "fetched_at": row[3]}
+
+    def put(self, key: str, topic: str, summary: str, sources: list[dict]):
+        """Store freshly grounded notes for a normalized topic."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO research (key, topic, summary, sources, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, topic, summary, json.dumps(sources), time.time()),
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and entry counts."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            entries, stale = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(fetched_at < ?), 0) FROM research", (cutoff,)
+            ).fetchone()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "stale": stale}
+
+
+_cache: Optional[ResearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_research_cache() -> ResearchCache:
+    """Get the process-wide research cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResearchCache()
+        return _cache
@@ -0,0 +1,320 @@
+"""Retry, backoff and circuit breaking for LLM, image and TTS calls."""
+
+import asyncio
+import contextvars
+import json
+import random
+import threading
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import httpx
+import requests
+from pydantic import ValidationError
+
+from src.config import CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_RESET
+from src.rate_limit import is_rate_limit_error
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# Policies per error class (see classify_error). Classes not listed are not retried.
+RETRY_POLICIES = {
+    "rate_limit": RetryPolicy(max_attempts=6, base_delay=5.0, max_delay=120.0),
+    "server": RetryPolicy(max_attempts=4, base_delay=2.0, max_delay=60.0),
+    "network": RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=30.0),
+    "unknown": RetryPolicy(max_attempts=2, base_delay=2.0, max_delay=10.0),
+}
+
+# Malformed model output is retried by re-running the unit of work, not the HTTP call
+INVALID_OUTPUT_POLICIES = {
+    "invalid_output": RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=5.0),
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+def classify_error(exc: BaseException) -> str:
+    """
+    Map an exception to an error class.
+
+    Returns one of: "rate_limit", "server", "network", "client",
+    "invalid_output", "circuit_open", "unknown".
+    """
+    if isinstance(exc, CircuitOpenError):
+        return "circuit_open"
+    if is_rate_limit_error(exc):
+        return "rate_limit"
+
+    status = getattr(exc, "code", None) or getattr(exc, "status", None)
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+    if isinstance(status, int):
+        if status >= 500 or status in (408, 409):
+            return "server"
+        if 400 <= status < 500:
+            return "client"
+
+    if isinstance(exc, (httpx.TransportError, requests.ConnectionError,
+                        requests.Timeout, ConnectionError, TimeoutError)):
+        return "network"
+    if isinstance(exc, (json.JSONDecodeError, ValidationError)):
+        return "invalid_output"
+    return "unknown"
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After `threshold` consecutive failures the circuit opens and calls fail
+    fast with CircuitOpenError. Once `reset_timeout` has passed, one trial
+    call is let through (half-open); success closes the circuit again.
+    """
+
+    def __init__(self, name: str, threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_BREAKER_RESET):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may proceed."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        raise CircuitOpenError(f"{self.name} circuit is open after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a half-open trial without a verdict; the next call becomes the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print(f"  Circuit opened for {self.name} after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a provider."""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def _next_delay(exc: BaseException, attempt: int, policies: dict) -> Optional[float]:
+    """Backoff before the next attempt, or None if the error should propagate."""
+    policy = policies.get(classify_error(exc))
+    if policy is None or attempt + 1 >= policy.max_attempts:
+        return None
+    return policy.delay(attempt)
+
+
+def _record_outcome(breaker: CircuitBreaker, exc: Optional[BaseException]):
+    # Only provider-side failures count against the circuit; any other
+    # outcome (429, 4xx, bad output, cancellation) must still end a trial
+    if exc is None:
+        breaker.record_success()
+    elif isinstance(exc, Exception) and classify_error(exc) in ("server", "network", "unknown"):
+        breaker.record_failure()
+    else:
+        breaker.release_trial()
+
+
+def call_with_retry(
+    provider: str,
+    fn: Callable[..., Any],
+    *args,
+    policies: dict = RETRY_POLICIES,
+    **kwargs,
+) -> Any:
+    """
+    Call fn, retrying per error class with backoff behind the provider's circuit breaker.
+
+    Args:
+        provider: "gemini" or "replicate"
+        fn: The call to make
+        policies: RetryPolicy per error class
+
+    Returns:
+        fn's return value
+    """
+    breaker = get_breaker(provider)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            _record_outcome(breaker, e)
+            if not isinstance(e, Exception):  # KeyboardInterrupt, closed generator...
+                raise
+            delay = _next_delay(e, attempt, policies)
+            if delay is None:
+                raise
+            print(f"  {provider} call failed ({classify_error(e)}: {e}); "
+                  f"retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        _record_outcome(breaker, None)
+        return result
+
+
+async def acall_with_retry(
+    provider: str,
+    fn: Callable[..., Any],
+    *args,
+    policies: dict = RETRY_POLICIES,
+    **kwargs,
+) -> Any:
+    """Async counterpart of call_with_retry; fn is a coroutine function."""
+    breaker = get_breaker(provider)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            _record_outcome(breaker, e)
+            if not isinstance(e, Exception):  # CancelledError, KeyboardInterrupt...
+                raise
+            delay = _next_delay(e, attempt, policies)
+            if delay is None:
+                raise
+            print(f"  {provider} call failed ({classify_error(e)}: {e}); "
+                  f"retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        _record_outcome(breaker, None)
+        return result
+
+
+def run_with_retry(
+    fn: Callable[..., Any],
+    *args,
+    policies: dict = RETRY_POLICIES,
+    label: str = "task",
+) -> Any:
+    """
+    Run a unit of work, re-running it after a backoff when it fails.
+
+    The blocking counterpart of submit_with_retry. No circuit breaker is
+    involved: fn's own provider calls already go through call_with_retry.
+
+    Returns:
+        fn's return value
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn(*args)
+        except Exception as e:
+            delay = _next_delay(e, attempt, policies)
+            if delay is None:
+                raise
+            print(f"  {label} failed ({classify_error(e)}: {e}); retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def submit_with_retry(
+    executor: Executor,
+    fn: Callable[..., Any],
+    *args,
+    policies: dict = RETRY_POLICIES,
+    label: str = "task",
+) -> Future:
+    """
+    Submit fn to an executor, re-queueing it after a backoff when it fails.
+
+    The backoff runs on a timer rather than in the worker, so a failing unit
+    frees its worker for the rest of the phase while it waits. Callers must
+    wait on the returned futures before shutting the executor down.
+
+    Returns:
+        Future resolving to fn's result, or its final exception
+    """
+    outer: Future = Future()
+    # Run every attempt in the submitter's context (e.g. its telemetry phase)
+    context = contextvars.copy_context()
+
+    def attempt(n: int):
+        if outer.cancelled():
+            return
+        try:
+            inner = executor.submit(context.copy().run, fn, *args)
+        except RuntimeError as e:  # Executor already shut down
+            outer.set_exception(e)
+            return
+        inner.add_done_callback(lambda f: finished(f, n))
+
+    def finished(inner: Future, n: int):
+        if outer.done():
+            return
+        if inner.cancelled():
+            outer.cancel()
+            return
+        exc = inner.exception()
+        if exc is None:
+            outer.set_result(inner.result())
+            return
+        delay = _next_delay(exc, n, policies)
+        if delay is None:
+            outer.set_exception(exc)
+            return
+        print(f"  {label} failed ({classify_error(exc)}: {exc}); re-queued in {delay:.1f}s")
+        timer = threading.Timer(delay, attempt, (n + 1,))
+        timer.daemon = True
+        timer.start()
+
+    attempt(0)
+    return outer
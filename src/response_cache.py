@@ -0,0 +1,181 @@
+"""Content-addressed on-disk cache for Gemini responses."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Optional
+
+from src.config import REBUILD_ALL, RESPONSE_CACHE_FILE, RESPONSE_CACHE_MAX_BYTES
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with size-based LRU eviction.
+
+    Entries are keyed by a SHA-256 of everything that determines the model
+    output (model, prompt, temperature, tools, response schema). Payloads are
+    JSON, zlib-compressed. When the total payload size exceeds max_bytes, the
+    least recently used entries are evicted.
+
+    With refresh set (--rebuild), every lookup misses but fresh responses
+    are still stored, so the next run reuses them.
+    """
+
+    def __init__(self, path: Path = RESPONSE_CACHE_FILE, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 refresh: bool = REBUILD_ALL):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(
+        model: str,
+        contents: str,
+        temperature: float,
+        tools: list[str] = None,
+        response_schema: dict = None,
+    ) -> str:
+        """Hash the request parameters that determine a response."""
+        material = json.dumps(
+            {
+                "model": model,
+                "contents": contents,
+                "temperature": temperature,
+                "tools": sorted(tools or []),
+                "response_schema": response_schema,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        key: str,
+        max_age: Optional[float] = None,
+        accept: Optional[Callable[[dict], bool]] = None,
+    ) -> Optional[dict]:
+        """
+        Look up a cached payload.
+
+        Args:
+            key: Cache key from make_key
+            max_age: Treat entries older than this many seconds as misses
+            accept: Treat payloads this rejects as misses
+
+        Returns:
+            The cached payload, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            if self.refresh:
+                self.misses += 1
+                return None
+
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (max_age is not None and now - row[1] > max_age):
+                self.misses += 1
+                return None
+
+        payload = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        accepted = accept is None or accept(payload)
+
+        with self._lock:
+            if not accepted:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+
+        return payload
+
+    def put(self, key: str, payload: dict):
+        """Store a payload and evict least recently used entries over the size budget."""
+        blob = zlib.compress(json.dumps(payload).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current store size."""
+        with self._lock:
+            conn = self._connect()
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "bytes": size,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
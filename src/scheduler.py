@@ -0,0 +1,120 @@
+"""Dependency-graph scheduler for pipeline phases."""
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+@dataclass
+class TaskNode:
+    """One unit of the pipeline graph."""
+
+    name: str
+    fn: Callable[..., Any]
+    deps: tuple[str, ...] = ()
+    started_at: float = None
+    finished_at: float = None
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class TaskGraph:
+    """
+    A DAG of pipeline phases run with maximal concurrency.
+
+    Each node's function is called with its dependencies' results as
+    keyword arguments (named after the dependency nodes). A node starts as
+    soon as all of its dependencies have finished, so total latency is
+    bounded by the critical path rather than the sum of the phases.
+
+    Usage:
+        graph = TaskGraph()
+        graph.add("style_guide", lambda: run_style_guide_structured(curriculum))
+        graph.add("prompts", lambda: run_curriculum_analysis_structured(curriculum))
+        graph.add("chapters", lambda style_guide, prompts: ..., deps=("style_guide", "prompts"))
+        results = graph.run()
+    """
+
+    nodes: dict[str, TaskNode] = field(default_factory=dict)
+
+    def add(self, name: str, fn: Callable[..., Any], deps: tuple[str, ...] = ()) -> "TaskGraph":
+        if name in self.nodes:
+            raise ValueError(f"Duplicate task: {name}")
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Task {name} depends on unknown task {dep} (add dependencies first)")
+        self.nodes[name] = TaskNode(name, fn, tuple(deps))
+        return self
+
+    def run(self, max_workers: int = None) -> dict[str, Any]:
+        """
+        Run every node, respecting dependencies.
+
+        Args:
+            max_workers: Concurrent nodes (defaults to the number of nodes)
+
+        Returns:
+            Results keyed by node name
+
+        Raises:
+            The first node exception; nodes not yet started are skipped
+        """
+        results: dict[str, Any] = {}
+        pending = dict(self.nodes)
+        running: dict[Future, TaskNode] = {}
+        graph_start = time.monotonic()
+
+        def start(node: TaskNode) -> Future:
+            kwargs = {dep: results[dep] for dep in node.deps}
+
+            def call():
+                node.started_at = time.monotonic() - graph_start
+                try:
+                    return node.fn(**kwargs)
+                finally:
+                    node.finished_at = time.monotonic() - graph_start
+
+            # Nodes inherit the caller's context (e.g. telemetry phase)
+            return executor.submit(contextvars.copy_context().run, call)
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.nodes) or 1) as executor:
+            while pending or running:
+                for name, node in list(pending.items()):
+                    if all(dep in results for dep in node.deps):
+                        running[start(node)] = node
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    results[node.name] = future.result()
+
+        return results
+
+    def timings(self) -> dict[str, dict]:
+        """Per-node start/finish offsets and durations (seconds) from the last run."""
+        return {
+            name: {
+                "deps": list(node.deps),
+                "started_at": round(node.started_at, 3) if node.started_at is not None else None,
+                "finished_at": round(node.finished_at, 3) if node.finished_at is not None else None,
+                "duration": round(node.duration, 3),
+            }
+            for name, node in self.nodes.items()
+        }
+
+    def print_timings(self):
+        """Print when each node ran relative to the start of the graph."""
+        for name, t in self.timings().items():
+            if t["started_at"] is None:
+                print(f"  {name:<22} (not run)")
+                continue
+            print(f"  {name:<22} {t['started_at']:>8.1f}s -> {t['finished_at']:>8.1f}s "
+                  f"({t['duration']:.1f}s)")
@@ -49,9 +49,43 @@ class ChapterContent(BaseModel):
         "'tutorial', 'video', 'click', 'scroll', 'next section'. "
         "Write like a technical BOOK author (Kernighan, Knuth, Fowler), not a YouTuber or blogger."
     )
-    sources: list[str] = Field(
-        default_factory=list,
-        description="Sources and references used"
+
+
+class ResearchNote(BaseModel):
+    """Schema for grounded research notes on one topic."""
+
+    topic: str = Field(description="The research topic")
+    notes: str = Field(
+        description="Concise factual notes in markdown bullets: current state, versions, "
+        "dates, named tools and implementations, open debates"
+    )
+
+
+class SectionOutline(BaseModel):
+    """Schema for one planned section of a chapter."""
+
+    heading: str = Field(description="Section heading text, without the leading ###")
+    summary: str = Field(description="What this section covers, in one or two sentences")
+    key_points: list[str] = Field(
+        description="Concepts, examples and code this section must include"
+    )
+    target_words: int = Field(description="Approximate length of the section in words")
+    figure: str = Field(
+        default="",
+        description="Description of one illustration that would help this section, "
+        "or an empty string if none is needed"
+    )
+
+
+class ChapterOutline(BaseModel):
+    """Schema for a chapter's section plan, produced before any section is drafted."""
+
+    title: str = Field(description="Chapter title")
+    introduction: str = Field(
+        description="What the opening paragraphs under the chapter heading establish"
+    )
+    sections: list[SectionOutline] = Field(
+        description="Sections in reading order, with no overlap between them"
     )
 
 
@@ -0,0 +1,217 @@
+"""Per-call token and latency telemetry with per-phase rollups."""
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from src.config import OUTPUTS_DIR
+
+RUN_REPORT_FILE = OUTPUTS_DIR / "run-report.json"
+
+# Phase that API calls made from the current thread/task are attributed to.
+# Executors do not propagate context on their own: submit work with
+# contextvars.copy_context().run so calls land in the caller's phase.
+_current_phase: contextvars.ContextVar[str] = contextvars.ContextVar("phase", default="other")
+
+_lock = threading.Lock()
+_calls: list[dict] = []
+_phase_times: dict[str, float] = {}
+_graphs: dict[str, dict] = {}
+_started_at = datetime.now().isoformat(timespec="seconds")
+
+
+def current_phase() -> str:
+    return _current_phase.get()
+
+
+@contextmanager
+def attribute(name: str):
+    """
+    Attribute API calls inside the block to a phase without timing it.
+
+    For work that runs concurrently within one phase, where summing each
+    block's duration would overstate the phase; time the phase once with
+    record_phase_time instead.
+    """
+    token = _current_phase.set(name)
+    try:
+        yield
+    finally:
+        _current_phase.reset(token)
+
+
+def record_phase_time(name: str, elapsed: float):
+    """Add elapsed seconds to a phase's wall time."""
+    with _lock:
+        _phase_times[name] = _phase_times.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute API calls inside the block to a phase and time the phase."""
+    start = time.monotonic()
+    try:
+        with attribute(name):
+            yield
+    finally:
+        record_phase_time(name, time.monotonic() - start)
+
+
+def record_gemini_call(
+    model: str,
+    usage: Any = None,
+    wall_time: float = 0.0,
+    ttft: Optional[float] = None,
+    from_cache: bool = False,
+):
+    """
+    Record one Gemini call.
+
+    Args:
+        model: Model name
+        usage: response.usage_metadata (None for response-cache hits)
+        wall_time: Seconds from request to complete response
+        ttft: Seconds to the first streamed chunk (streaming calls only)
+        from_cache: Whether the response came from the on-disk response cache
+    """
+    entry = {
+        "provider": "gemini",
+        "phase": current_phase(),
+        "model": model,
+        "prompt_tokens": getattr(usage, "prompt_token_count", None) or 0,
+        "candidates_tokens": getattr(usage, "candidates_token_count", None) or 0,
+        "cached_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+        "wall_time": round(wall_time, 3),
+        "ttft": round(ttft, 3) if ttft is not None else None,
+        "from_cache": from_cache,
+    }
+    with _lock:
+        _calls.append(entry)
+
+
+def record_replicate_call(
+    model: str,
+    wall_time: float,
+    predict_time: Optional[float] = None,
+    queue_time: Optional[float] = None,
+):
+    """
+    Record one Replicate prediction.
+
+    Args:
+        model: Model reference
+        wall_time: Seconds from create to completion as seen by this process
+        predict_time: Model runtime reported in prediction.metrics
+        queue_time: Seconds between created_at and started_at
+    """
+    entry = {
+        "provider": "replicate",
+        "phase": current_phase(),
+        "model": model,
+        "wall_time": round(wall_time, 3),
+        "predict_time": round(predict_time, 3) if predict_time is not None else None,
+        "queue_time": round(queue_time, 3) if queue_time is not None else None,
+    }
+    with _lock:
+        _calls.append(entry)
+
+
+def record_graph(name: str, timings: dict):
+    """Attach a scheduler graph's per-node timings to the run report."""
+    with _lock:
+        _graphs[name] = timings
+
+
+def summary() -> dict:
+    """Roll up recorded calls per phase."""
+    with _lock:
+        calls = list(_calls)
+        phase_times = dict(_phase_times)
+
+    phases: dict[str, dict] = {}
+    for call in calls:
+        rollup = phases.setdefault(call["phase"], {
+            "gemini_calls": 0,
+            "response_cache_hits": 0,
+            "prompt_tokens": 0,
+            "candidates_tokens": 0,
+            "cached_tokens": 0,
+            "gemini_wall_time": 0.0,
+            "ttft": [],
+            "replicate_calls": 0,
+            "predict_time": 0.0,
+            "queue_time": 0.0,
+            "replicate_wall_time": 0.0,
+        })
+        if call["provider"] == "gemini":
+            rollup["gemini_calls"] += 1
+            rollup["response_cache_hits"] += call["from_cache"]
+            rollup["prompt_tokens"] += call["prompt_tokens"]
+            rollup["candidates_tokens"] += call["candidates_tokens"]
+            rollup["cached_tokens"] += call["cached_tokens"]
+            rollup["gemini_wall_time"] += call["wall_time"]
+            if call["ttft"] is not None:
+                rollup["ttft"].append(call["ttft"])
+        else:
+            rollup["replicate_calls"] += 1
+            rollup["predict_time"] += call["predict_time"] or 0.0
+            rollup["queue_time"] += call["queue_time"] or 0.0
+            rollup["replicate_wall_time"] += call["wall_time"]
+
+    for name, rollup in phases.items():
+        ttfts = rollup.pop("ttft")
+        rollup["mean_ttft"] = round(sum(ttfts) / len(ttfts), 3) if ttfts else None
+        for key in ("gemini_wall_time", "predict_time", "queue_time", "replicate_wall_time"):
+            rollup[key] = round(rollup[key], 3)
+
+    for name, elapsed in phase_times.items():
+        phases.setdefault(name, {})["elapsed"] = round(elapsed, 3)
+
+    return phases
+
+
+def write_report(path: Path = RUN_REPORT_FILE) -> Path:
+    """Write the run report (per-phase rollups plus every call) as JSON."""
+    with _lock:
+        calls = list(_calls)
+        graphs = dict(_graphs)
+    report = {
+        "started_at": _started_at,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "phases": summary(),
+        "graphs": graphs,
+        "calls": calls,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def print_summary():
+    """Print a per-phase table of calls, tokens and time."""
+    phases = summary()
+    if not phases:
+        return
+
+    header = f"{'Phase':<22}{'Elapsed':>9}{'Gemini':>8}{'Prompt tok':>12}{'Output tok':>12}" \
+             f"{'Cached tok':>12}{'TTFT':>7}{'Replicate':>10}{'Predict s':>10}{'Queue s':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in phases.items():
+        elapsed = r.get("elapsed")
+        ttft = r.get("mean_ttft")
+        print(f"{name:<22}"
+              f"{(f'{elapsed:.0f}s' if elapsed is not None else '-'):>9}"
+              f"{r.get('gemini_calls', 0):>8}"
+              f"{r.get('prompt_tokens', 0):>12,}"
+              f"{r.get('candidates_tokens', 0):>12,}"
+              f"{r.get('cached_tokens', 0):>12,}"
+              f"{(f'{ttft:.1f}s' if ttft is not None else '-'):>7}"
+              f"{r.get('replicate_calls', 0):>10}"
+              f"{r.get('predict_time', 0.0):>10.0f}"
+              f"{r.get('queue_time', 0.0):>9.0f}")
@@ -0,0 +1,63 @@
+"""Tests for the checkpoint journal."""
+
+import json
+
+from src.checkpoint import CheckpointJournal
+
+
+def test_journal_resumes_completed_units(tmp_path):
+    output = tmp_path / "out.md"
+    output.write_text("done")
+    journal = CheckpointJournal(tmp_path / "checkpoint.jsonl")
+    journal.start()
+    journal.complete("chapter-01", {"prompt": "p"}, [output])
+
+    resumed = CheckpointJournal(tmp_path / "checkpoint.jsonl")
+    resumed.start(resume=True)
+    assert resumed.is_complete("chapter-01", {"prompt": "p"}, [output])
+    assert not resumed.is_complete("chapter-01", {"prompt": "q"}, [output])
+    assert not resumed.is_complete("chapter-02", {"prompt": "p"}, [output])
+
+
+def test_journal_hashes_path_inputs_by_content(tmp_path):
+    source = tmp_path / "chapter.md"
+    source.write_text("v1")
+    journal = CheckpointJournal(tmp_path / "checkpoint.jsonl")
+    journal.start()
+    journal.complete("enhanced-01", {"source": source})
+    assert journal.is_complete("enhanced-01", {"source": source})
+
+    source.write_text("v2")
+    assert not journal.is_complete("enhanced-01", {"source": source})
+
+
+def test_fresh_start_discards_previous_units(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoint.jsonl")
+    journal.start()
+    journal.complete("a")
+
+    restarted = CheckpointJournal(tmp_path / "checkpoint.jsonl")
+    restarted.start(resume=False)
+    assert not restarted.is_complete("a")
+
+
+def test_torn_last_line_is_ignored_and_appends_stay_readable(tmp_path, capsys):
+    path = tmp_path / "checkpoint.jsonl"
+    journal = CheckpointJournal(path)
+    journal.start()
+    journal.complete("a")
+    with open(path, "a") as f:
+        f.write('{"unit": "b", "inp')  # Crash mid-write
+
+    resumed = CheckpointJournal(path)
+    resumed.start(resume=True)
+    assert resumed.is_complete("a")
+    assert not resumed.is_complete("b")
+    resumed.complete("c")
+
+    again = CheckpointJournal(path)
+    again.start(resume=True)
+    assert again.is_complete("a") and again.is_complete("c")
+    units = [json.loads(line).get("unit") for line in path.read_text().splitlines()
+             if line.startswith('{"unit": "c"')]
+    assert units == ["c"]
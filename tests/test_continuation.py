@@ -0,0 +1,69 @@
+"""Tests for splicing MAX_TOKENS continuations onto truncated responses."""
+
+from src.config import CONTINUATION_MIN_OVERLAP
+from src.gemini_client import GenerationResult, _overlap, _splice, _trim_overlap
+
+TEXT = "MCP servers expose tools, resources and prompts to clients over stdio or HTTP"
+
+
+def splice(text: str, continuation: str) -> str:
+    return _splice(GenerationResult(text=text), GenerationResult(text=continuation)).text
+
+
+def test_repeated_tail_is_trimmed():
+    assert splice(TEXT, "resources and prompts to clients over stdio or HTTP transports.") \
+        == TEXT + " transports."
+
+
+def test_continuation_without_overlap_is_appended():
+    assert _overlap(TEXT, " transports.") == 0
+    assert splice(TEXT, " transports.") == TEXT + " transports."
+
+
+def test_short_coincidental_overlap_is_kept():
+    # "HTTP" recurring at the start is real text, not a repeat
+    continuation = "HTTP/2 is not required."
+    assert len("HTTP") < CONTINUATION_MIN_OVERLAP
+    assert splice(TEXT, continuation) == TEXT + continuation
+
+
+def test_overlap_ending_at_trailing_whitespace():
+    text = TEXT + " "
+    assert splice(text, "prompts to clients over stdio or HTTP transports.") \
+        == TEXT + " transports."
+
+
+def test_overlap_across_paragraph_break():
+    text = TEXT + ".\n\n"
+    assert splice(text, "clients over stdio or HTTP.\n\n### Transports\n") \
+        == TEXT + ".\n\n### Transports\n"
+
+
+def test_whitespace_only_boundary_is_preserved():
+    assert splice(TEXT + ".\n\n", "### Transports\n") == TEXT + ".\n\n### Transports\n"
+    assert splice(TEXT + " and", " WebSocket.") == TEXT + " and WebSocket."
+
+
+def test_splice_merges_metadata():
+    first = GenerationResult(text=TEXT, sources=[{"title": "a", "uri": "u1"}],
+                             search_queries=["mcp"], usage={"prompt_tokens": 10, "candidates_tokens": 5},
+                             finish_reason="MAX_TOKENS")
+    more = GenerationResult(text=".", sources=[{"title": "b", "uri": "u2"}],
+                            search_queries=["mcp", "stdio"], usage={"prompt_tokens": 12, "candidates_tokens": 1},
+                            finish_reason="STOP")
+    result = _splice(first, more)
+    assert [s["uri"] for s in result.sources] == ["u1", "u2"]
+    assert result.search_queries == ["mcp", "stdio"]
+    assert result.usage == {"prompt_tokens": 22, "candidates_tokens": 6}
+    assert result.finish_reason == "STOP"
+
+
+def test_trim_overlap_across_stream_deltas():
+    repeated = "prompts to clients over stdio or HTTP"
+    deltas = [repeated[:10], repeated[10:], " transports", "."]
+    assert "".join(_trim_overlap(TEXT, deltas)) == " transports."
+
+
+def test_trim_overlap_passes_new_text_through():
+    deltas = [" trans", "ports."]
+    assert "".join(_trim_overlap(TEXT, deltas)) == " transports."
@@ -0,0 +1,48 @@
+"""Tests for incremental JSON array item extraction."""
+
+import json
+
+import pytest
+
+from src.json_stream import JsonArrayItemParser
+
+DOCUMENT = json.dumps({
+    "title": "Course",
+    "chapters": [
+        {"title": "Intro", "topics": ["a", "b"], "meta": {"n": 1}},
+        {"title": 'Quotes \" and } braces {', "topics": []},
+        {"title": "Unicode é", "chapters": [{"nested": True}]},
+    ],
+    "notes": [{"ignored": True}],
+})
+
+
+def parse_in_chunks(text: str, size: int) -> list[dict]:
+    parser = JsonArrayItemParser("chapters")
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(DOCUMENT)])
+def test_items_match_full_parse_for_any_chunking(size):
+    assert parse_in_chunks(DOCUMENT, size) == json.loads(DOCUMENT)["chapters"]
+
+
+def test_items_are_emitted_as_soon_as_they_close():
+    parser = JsonArrayItemParser("chapters")
+    assert parser.feed('{"chapters": [{"title": "One"}') == [{"title": "One"}]
+    assert parser.feed(', {"title": "Tw') == []
+    assert parser.feed('o"}]}') == [{"title": "Two"}]
+
+
+def test_other_arrays_are_ignored():
+    parser = JsonArrayItemParser("chapters")
+    assert parser.feed('{"other": [{"x": 1}], "chapters": []}') == []
+
+
+def test_buffer_does_not_retain_consumed_items():
+    parser = JsonArrayItemParser("chapters")
+    parser.feed('{"chapters": [' + ", ".join(['{"title": "x"}'] * 100))
+    assert len(parser._buffer) < 20
@@ -0,0 +1,51 @@
+"""Tests for the content-hash build manifest."""
+
+from src.manifest import BuildManifest, fingerprint, fingerprint_inputs
+
+
+def test_paths_are_hashed_by_content(tmp_path):
+    path = tmp_path / "input.md"
+    path.write_text("one")
+    before = fingerprint(path)
+    path.write_text("two")
+    assert fingerprint(path) != before
+    assert fingerprint(tmp_path / "absent.md") == "missing"
+
+
+def test_nested_inputs_hash_independently_of_key_order():
+    assert fingerprint({"a": 1, "b": [1, 2]}) == fingerprint({"b": [1, 2], "a": 1})
+
+
+def test_fingerprint_inputs_hashes_each_value():
+    assert fingerprint_inputs({"text": "x", "n": 1}) == {"text": fingerprint("x"), "n": fingerprint(1)}
+
+
+def test_manifest_reuses_until_inputs_or_outputs_change(tmp_path):
+    source = tmp_path / "source.md"
+    source.write_text("v1")
+    output = tmp_path / "out.md"
+    output.write_text("built")
+    manifest = BuildManifest(tmp_path / "manifest.json", force=False)
+    inputs = {"source": source, "model": "m"}
+
+    assert not manifest.is_fresh("chapter-01", inputs, [output])
+    manifest.record("chapter-01", inputs, [output])
+    assert manifest.is_fresh("chapter-01", inputs, [output])
+
+    # Reloaded from disk
+    manifest = BuildManifest(tmp_path / "manifest.json", force=False)
+    assert manifest.is_fresh("chapter-01", inputs, [output])
+    assert not manifest.is_fresh("chapter-01", {**inputs, "model": "n"}, [output])
+
+    source.write_text("v2")
+    assert not manifest.is_fresh("chapter-01", inputs, [output])
+
+    source.write_text("v1")
+    output.unlink()
+    assert not manifest.is_fresh("chapter-01", inputs, [output])
+
+
+def test_forced_manifest_is_never_fresh(tmp_path):
+    manifest = BuildManifest(tmp_path / "manifest.json", force=True)
+    manifest.record("a", {}, [])
+    assert not manifest.is_fresh("a", {}, [])
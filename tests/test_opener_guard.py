@@ -0,0 +1,75 @@
+"""Tests for the forbidden-opener guard on streamed chapters."""
+
+from src.gemini_client import TextStream
+from src.pipeline import find_forbidden_opener, strip_preamble, write_guarded_stream
+
+
+def make_text_stream(deltas: list[str], consumed: list[str]) -> TextStream:
+    """TextStream over fixed deltas, recording each delta as it is read."""
+    def chunks():
+        for delta in deltas:
+            consumed.append(delta)
+            yield delta
+
+    stream = TextStream()
+    stream._chunks = chunks()
+    return stream
+
+
+def test_forbidden_opener_is_detected():
+    decided, opener = find_forbidden_opener("## Transports\n\nIn this chapter we cover stdio.\n")
+    assert decided
+    assert opener == "In this chapter we cover stdio."
+
+
+def test_declarative_opening_is_accepted():
+    assert find_forbidden_opener("## Transports\n\nMCP defines two transports.\n") == (True, "")
+
+
+def test_preamble_before_the_heading_is_left_to_strip_preamble():
+    text = "Sure! Here is the chapter.\n\n## Transports\n\nMCP defines two transports.\n"
+    assert find_forbidden_opener(text) == (True, "")
+
+
+def test_incomplete_first_line_is_undecided():
+    # The last line may still be growing until the stream is complete
+    assert find_forbidden_opener("## Transports\n\nIn this chapter") == (False, "")
+    assert find_forbidden_opener("## Transports\n\nIn this chapter", complete=True) \
+        == (True, "In this chapter")
+
+
+def test_opener_split_across_chunks_aborts_and_retries(tmp_path):
+    output_path = tmp_path / "chapter.md"
+    attempts = []
+
+    def make_stream(extra):
+        consumed = []
+        attempts.append((extra, consumed))
+        if len(attempts) == 1:
+            deltas = ["## Transports\n\nIn th", "is chapter", " we cover stdio.\n", "More text.\n"]
+        else:
+            deltas = ["## Transports\n\nMCP defines", " two transports.\n"]
+        return make_text_stream(deltas, consumed)
+
+    text = write_guarded_stream(make_stream, output_path, postprocess=strip_preamble)
+
+    assert text == "## Transports\n\nMCP defines two transports.\n"
+    assert output_path.read_text() == text
+    assert not (tmp_path / "chapter.md.partial").exists()
+    first_extra, first_consumed = attempts[0]
+    assert first_extra == ""
+    assert "More text.\n" not in first_consumed  # Aborted as soon as the line closed
+    assert "In this chapter we cover stdio." in attempts[1][0]
+
+
+def test_last_attempt_is_accepted_unguarded(tmp_path):
+    output_path = tmp_path / "chapter.md"
+    attempts = []
+
+    def make_stream(extra):
+        attempts.append(extra)
+        return make_text_stream(["## T\n\nLet's begin.\n"], [])
+
+    text = write_guarded_stream(make_stream, output_path, retries=1)
+    assert len(attempts) == 2
+    assert text == "## T\n\nLet's begin.\n"
@@ -0,0 +1,83 @@
+"""Tests for the adaptive token-bucket limiter."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src import rate_limit
+from src.rate_limit import (
+    MIN_RATE_SCALE,
+    TokenBucketLimiter,
+    is_rate_limit_error,
+    retry_after_seconds,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manually advanced monotonic clock; sleeping advances it."""
+    now = [1000.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limit.time, "sleep", sleep)
+    return now
+
+
+def test_burst_up_to_one_minute_of_capacity(clock):
+    limiter = TokenBucketLimiter("test", rpm=5)
+    for _ in range(5):
+        assert limiter._try_acquire(0) == 0.0
+    assert limiter._try_acquire(0) == pytest.approx(12.0)
+
+
+def test_acquire_waits_for_refill(clock):
+    limiter = TokenBucketLimiter("test", rpm=60)
+    for _ in range(60):
+        limiter.acquire()
+    start = clock[0]
+    limiter.acquire()
+    assert clock[0] - start == pytest.approx(1.0)
+
+
+def test_token_budget_limits_large_requests(clock):
+    limiter = TokenBucketLimiter("test", rpm=100, tpm=1000)
+    assert limiter._try_acquire(800) == 0.0
+    assert limiter._try_acquire(400) == pytest.approx(12.0)
+
+
+def test_requests_larger_than_the_budget_are_clamped(clock):
+    limiter = TokenBucketLimiter("test", rpm=100, tpm=1000)
+    assert limiter._try_acquire(5000) == 0.0
+
+
+def test_throttle_pauses_and_halves_rate(clock, capsys):
+    limiter = TokenBucketLimiter("test", rpm=60)
+    limiter.record_throttle(retry_after=30.0)
+    assert limiter.rate_scale == 0.5
+    assert limiter._try_acquire(0) == pytest.approx(30.0)
+
+
+def test_rate_recovers_additively_with_a_floor(clock, capsys):
+    limiter = TokenBucketLimiter("test", rpm=60)
+    for _ in range(10):
+        limiter.record_throttle(retry_after=0.0)
+    assert limiter.rate_scale == MIN_RATE_SCALE
+    limiter.record_success()
+    assert limiter.rate_scale == pytest.approx(MIN_RATE_SCALE + 0.05)
+
+
+def test_rate_limit_error_detection():
+    assert is_rate_limit_error(SimpleNamespace(code=429))
+    assert is_rate_limit_error(SimpleNamespace(status=429))
+    assert not is_rate_limit_error(SimpleNamespace(code=500))
+
+
+def test_retry_after_header():
+    error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "7"}))
+    assert retry_after_seconds(error) == 7.0
+    assert retry_after_seconds(SimpleNamespace(response=None)) is None
+    bad = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "soon"}))
+    assert retry_after_seconds(bad) is None
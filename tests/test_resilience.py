@@ -0,0 +1,147 @@
+"""Tests for retry policies and the circuit breaker."""
+
+import json
+
+import pytest
+
+from src import resilience
+from src.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    call_with_retry,
+    classify_error,
+)
+
+
+class FakeAPIError(Exception):
+    """SDK-style error carrying an HTTP status code."""
+
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+
+
+def failing(*errors, result="ok"):
+    """Callable raising each error in turn, then returning result."""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    fn.calls = calls
+    return fn
+
+
+def test_classify_error():
+    assert classify_error(FakeAPIError(429)) == "rate_limit"
+    assert classify_error(FakeAPIError(503)) == "server"
+    assert classify_error(FakeAPIError(408)) == "server"
+    assert classify_error(FakeAPIError(400)) == "client"
+    assert classify_error(ConnectionError()) == "network"
+    assert classify_error(json.JSONDecodeError("bad", "", 0)) == "invalid_output"
+    assert classify_error(CircuitOpenError()) == "circuit_open"
+    assert classify_error(RuntimeError()) == "unknown"
+
+
+def test_policy_delay_is_capped():
+    policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=5.0)
+    assert all(0 <= policy.delay(attempt) <= 5.0 for attempt in range(10))
+
+
+def test_retries_server_errors_until_success():
+    fn = failing(FakeAPIError(500), FakeAPIError(502))
+    assert call_with_retry("test", fn) == "ok"
+    assert len(fn.calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    fn = failing(FakeAPIError(400))
+    with pytest.raises(FakeAPIError):
+        call_with_retry("test", fn)
+    assert len(fn.calls) == 1
+
+
+def test_gives_up_after_max_attempts():
+    policies = {"server": RetryPolicy(max_attempts=2, base_delay=0.0, max_delay=0.0)}
+    fn = failing(*[FakeAPIError(500)] * 5)
+    with pytest.raises(FakeAPIError):
+        call_with_retry("test", fn, policies=policies)
+    assert len(fn.calls) == 2
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker("test", threshold=2, reset_timeout=60.0)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker("test", threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def open_breaker(provider: str) -> CircuitBreaker:
+    """Open a provider's breaker with the trial immediately due."""
+    breaker = CircuitBreaker(provider, threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    resilience._breakers[provider] = breaker
+    return breaker
+
+
+def test_trial_ending_in_client_error_releases_the_trial():
+    breaker = open_breaker("test")
+    with pytest.raises(FakeAPIError):
+        call_with_retry("test", failing(FakeAPIError(400)))
+    # The next call becomes the trial instead of failing fast forever
+    assert call_with_retry("test", failing()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_trial_interrupted_by_keyboard_interrupt_releases_the_trial():
+    breaker = open_breaker("test")
+    with pytest.raises(KeyboardInterrupt):
+        call_with_retry("test", failing(KeyboardInterrupt()))
+    assert call_with_retry("test", failing()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_rate_limits_do_not_open_the_circuit():
+    policies = {"rate_limit": RetryPolicy(max_attempts=10, base_delay=0.0, max_delay=0.0)}
+    fn = failing(*[FakeAPIError(429)] * 8)
+    assert call_with_retry("test", fn, policies=policies) == "ok"
+    assert resilience.get_breaker("test").failures == 0
+
+
+def test_run_with_retry_reruns_invalid_output():
+    fn = failing(json.JSONDecodeError("bad", "", 0))
+    assert resilience.run_with_retry(fn, policies=resilience.INVALID_OUTPUT_POLICIES) == "ok"
+    assert len(fn.calls) == 2
+
+
+def test_run_with_retry_does_not_take_the_breaker_trial():
+    open_breaker("gemini")
+
+    def unit():
+        return call_with_retry("gemini", failing())
+
+    assert resilience.run_with_retry(unit) == "ok"
@@ -0,0 +1,94 @@
+"""Tests for the on-disk response cache."""
+
+import pytest
+
+from src import response_cache
+from src.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manually advanced wall clock, so access order is unambiguous."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    return now
+
+
+def payload(n: int) -> dict:
+    # Incompressible-ish text so every entry has a similar, non-trivial size
+    return {"text": "".join(chr(33 + (n * 7919 + i * 104729) % 90) for i in range(400))}
+
+
+def entry_size(cache: ResponseCache, key: str) -> int:
+    return cache._connect().execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    key = ResponseCache.make_key("model", "prompt", 0.7)
+    assert cache.get(key) is None
+    cache.put(key, {"text": "hello"})
+    assert cache.get(key) == {"text": "hello"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_key_depends_on_every_parameter():
+    base = ResponseCache.make_key("m", "p", 0.7, ["google_search"], {"type": "object"})
+    assert base == ResponseCache.make_key("m", "p", 0.7, ["google_search"], {"type": "object"})
+    assert base != ResponseCache.make_key("m2", "p", 0.7, ["google_search"], {"type": "object"})
+    assert base != ResponseCache.make_key("m", "p2", 0.7, ["google_search"], {"type": "object"})
+    assert base != ResponseCache.make_key("m", "p", 0.2, ["google_search"], {"type": "object"})
+    assert base != ResponseCache.make_key("m", "p", 0.7, [], {"type": "object"})
+    assert base != ResponseCache.make_key("m", "p", 0.7, ["google_search"], None)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    for n in range(3):
+        clock[0] += 1
+        cache.put(f"k{n}", payload(n))
+    sizes = [entry_size(cache, f"k{n}") for n in range(3)]
+
+    # Touch the oldest entry so k1 becomes least recently used
+    clock[0] += 1
+    assert cache.get("k0") is not None
+
+    cache.max_bytes = sum(sizes) + sizes[0] // 2
+    clock[0] += 1
+    cache.put("k3", payload(3))
+
+    assert cache.get("k1") is None
+    assert cache.get("k0") == payload(0)
+    assert cache.get("k2") == payload(2)
+    assert cache.get("k3") == payload(3)
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_entries_older_than_max_age_are_misses(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    cache.put("grounded", {"text": "news"})
+
+    clock[0] += 3600
+    assert cache.get("grounded", max_age=7200) == {"text": "news"}
+    clock[0] += 7200
+    assert cache.get("grounded", max_age=7200) is None
+    assert cache.get("grounded") == {"text": "news"}  # Plain lookups never expire
+
+
+def test_rejected_payloads_count_as_misses(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    cache.put("k", {"text": "{not json"})
+    assert cache.get("k", accept=lambda p: p["text"].startswith("{\"")) is None
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_refresh_skips_lookups_but_stores_responses(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", refresh=True)
+    cache.put("k", {"text": "old"})
+    assert cache.get("k") is None
+    cache.put("k", {"text": "new"})
+
+    cache.refresh = False
+    assert cache.get("k") == {"text": "new"}
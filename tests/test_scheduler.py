@@ -0,0 +1,54 @@
+"""Tests for the dependency-graph scheduler."""
+
+import threading
+
+import pytest
+
+from src.scheduler import TaskGraph
+
+
+def test_results_are_passed_to_dependents():
+    graph = TaskGraph()
+    graph.add("a", lambda: 2)
+    graph.add("b", lambda: 3)
+    graph.add("c", lambda a, b: a * b, deps=("a", "b"))
+    assert graph.run() == {"a": 2, "b": 3, "c": 6}
+
+
+def test_independent_nodes_run_concurrently():
+    # Each node waits for the other to start, so this deadlocks if run serially
+    barrier = threading.Barrier(2, timeout=5)
+    graph = TaskGraph()
+    graph.add("a", barrier.wait)
+    graph.add("b", barrier.wait)
+    graph.run()
+
+
+def test_dependents_start_after_their_dependencies_finish():
+    graph = TaskGraph()
+    graph.add("first", lambda: None)
+    graph.add("second", lambda first: None, deps=("first",))
+    graph.run()
+    timings = graph.timings()
+    assert timings["second"]["started_at"] >= timings["first"]["finished_at"]
+
+
+def test_unknown_and_duplicate_tasks_are_rejected():
+    graph = TaskGraph()
+    graph.add("a", lambda: None)
+    with pytest.raises(ValueError):
+        graph.add("a", lambda: None)
+    with pytest.raises(ValueError):
+        graph.add("b", lambda missing: None, deps=("missing",))
+
+
+def test_failure_propagates_and_skips_dependents():
+    def fail():
+        raise RuntimeError("boom")
+
+    graph = TaskGraph()
+    graph.add("a", fail)
+    graph.add("b", lambda a: None, deps=("a",))
+    with pytest.raises(RuntimeError, match="boom"):
+        graph.run()
+    assert graph.timings()["b"]["started_at"] is None